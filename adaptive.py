@@ -0,0 +1,261 @@
+"""
+自适应测试次数（序贯检验）
+- 每个 IP 先测 min_samples 次，之后每测一次就检查：按当前样本，该 IP 落在“分界线”以外的置信度是否已达到 target
+- 分界线为目前已完成 IP 中第 N 名的统计量（平均延迟或 p90），设置了 -tl 时取两者较小值
+- 明显落选的 IP 很快停止；分界线以内和靠近分界线的 IP 才会测到 max_samples 次
+- 丢包次数已超出 -tlr 允许范围的 IP 立即停止；测满 max_samples 次也不可能比第 N 名丢包少的 IP 同样立即停止
+- 测满 min_samples 次全部丢包的 IP 直接判定落选，不再继续测试
+- 第一轮结束后分界线才确定，再对仍未达到置信度的 IP 补测
+- 输出的 result.csv 在原有列之后增加“置信度”列
+
+用法:
+    python adaptive.py -f ip.txt -tp 2087 -dn 10 --min 3 -t 10 --target 0.95 -o result.csv
+"""
+
+import argparse
+import asyncio
+import heapq
+import math
+import time
+from typing import Dict, List, Optional
+
+from elimination import SampleFn
+from probe import load_targets, raise_nofile_limit, rank_results, summarize, tcp_connect, write_result_csv
+
+# 标准差下限（毫秒），避免样本恰好相同时置信度虚高
+MIN_STDDEV = 0.5
+
+
+def normal_cdf(z: float) -> float:
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+def student_t_cdf(t: float, df: int) -> float:
+    """t 分布的累积分布函数（换算为近似正态分位数），样本少时比正态近似保守得多"""
+    z = t * (1 - 1 / (4 * df)) / math.sqrt(1 + t * t / (2 * df))
+    return normal_cdf(z)
+
+
+def statistic(latencies: List[float], stat: str = "mean") -> float:
+    if stat == "p90":
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.9 * len(ordered)) - 1)]
+    return sum(latencies) / len(latencies)
+
+
+def side_confidence(latencies: List[float], cut: float, stat: str = "mean") -> float:
+    """
+    统计量落在分界线同一侧（低于或高于 cut）的置信度
+
+    - mean：t 检验，t = |cut - 均值| / 标准误，自由度 n - 1
+    - p90：样本中不超过 cut 的比例与 0.9 比较，z = |p̂ - 0.9| / sqrt(0.09 / n)
+
+    Returns:
+        0.5 到 1 之间的置信度，分界线为无穷大时为 1
+    """
+    if math.isinf(cut):
+        return 1.0
+    n = len(latencies)
+    if n < 2:
+        return 0.5
+    if stat == "p90":
+        below = sum(1 for ms in latencies if ms <= cut) / n
+        z = abs(below - 0.9) / math.sqrt(0.09 / n)
+    else:
+        mean = sum(latencies) / n
+        stddev = max(math.sqrt(sum((ms - mean) ** 2 for ms in latencies) / (n - 1)), MIN_STDDEV)
+        return student_t_cdf(abs(cut - mean) / (stddev / math.sqrt(n)), n - 1)
+    return normal_cdf(z)
+
+
+class CutLine:
+    """已完成 IP 中第 N 名的统计量（与固定的延迟上限取较小值）和第 N 名的丢包率"""
+
+    def __init__(self, top_n: int, max_avg: Optional[float] = None):
+        self.top_n = top_n
+        self.max_avg = math.inf if max_avg is None else max_avg
+        self._heap: List[float] = []  # 取负数的最大堆，保存最好的 N 个
+        self._losses: List[float] = []  # 同上，保存最低的 N 个丢包率
+
+    @staticmethod
+    def _push(heap: List[float], size: int, value: float) -> None:
+        if len(heap) < size:
+            heapq.heappush(heap, -value)
+        elif value < -heap[0]:
+            heapq.heapreplace(heap, -value)
+
+    def add(self, value: float, loss: float = 0.0) -> None:
+        self._push(self._heap, self.top_n, value)
+        self._push(self._losses, self.top_n, loss)
+
+    def loss(self) -> float:
+        """第 N 名的丢包率，已完成的 IP 不足 N 个时为 1"""
+        return -self._losses[0] if len(self._losses) >= self.top_n else 1.0
+
+    def ruled_out(self, failures: int, max_samples: int) -> bool:
+        """按丢包率优先排名，测满 max_samples 次后的丢包率下限仍高于第 N 名时不可能进入前 N 名"""
+        return failures / max_samples > self.loss()
+
+    def value(self) -> float:
+        nth = -self._heap[0] if len(self._heap) >= self.top_n else math.inf
+        return min(nth, self.max_avg)
+
+
+async def sample_until_confident(
+    samples: List[Optional[float]],
+    sample_fn: SampleFn,
+    ip: str,
+    cut: CutLine,
+    min_samples: int,
+    max_samples: int,
+    target: float,
+    max_loss: float,
+    stat: str,
+) -> float:
+    """
+    在已有样本的基础上继续采样，直到以 target 的置信度确定落选、丢包超限（或已不可能进入前 N 名）、
+    测满 min_samples 次全部丢包，或达到 max_samples
+
+    Returns:
+        最后一次计算的置信度
+    """
+    allowed_failures = math.floor(max_loss * max_samples + 1e-9)
+    confidence = 0.0
+    while len(samples) < max_samples:
+        samples.append(await sample_fn(ip))
+        failures = sum(1 for ms in samples if ms is None)
+        if failures > allowed_failures or cut.ruled_out(failures, max_samples):
+            return 1.0  # 丢包已超出允许范围或已多于第 N 名，确定落选
+        ok = [ms for ms in samples if ms is not None]
+        if len(samples) >= min_samples and not ok:
+            return 1.0  # 全部丢包，确定落选（-tlr 1.0 时 allowed_failures 等于 max_samples，不会走到上面）
+        if len(samples) >= min_samples and ok:
+            cut_value = cut.value()
+            confidence = side_confidence(ok, cut_value, stat)
+            # 只有确定落选时提前停止；分界线以内的 IP 数量少，测满以免少数幸运样本混进前 N 名
+            if confidence >= target and statistic(ok, stat) > cut_value:
+                break
+    ok = [ms for ms in samples if ms is not None]
+    return side_confidence(ok, cut.value(), stat) if ok else 1.0
+
+
+async def adaptive_probe(
+    ips: List[str],
+    sample_fn: SampleFn,
+    top_n: int = 10,
+    min_samples: int = 3,
+    max_samples: int = 10,
+    target: float = 0.95,
+    stat: str = "mean",
+    max_loss: float = 1.0,
+    max_avg: Optional[float] = None,
+    concurrency: int = 300,
+    refine_passes: int = 3,
+) -> List[Dict]:
+    """
+    按序贯检验决定每个 IP 的测试次数
+
+    Args:
+        ips: 候选 IP
+        sample_fn: 采样函数，返回一次延迟（毫秒），失败返回 None
+        top_n: 需要的 IP 数，决定分界线
+        min_samples: 每个 IP 至少测试次数
+        max_samples: 每个 IP 最多测试次数
+        target: 需要达到的置信度
+        stat: "mean" 或 "p90"
+        max_loss: 丢包率上限
+        max_avg: 平均延迟上限（毫秒）
+        concurrency: 同时测试的 IP 数
+        refine_passes: 第一轮之后最多补测几轮
+
+    Returns:
+        summarize 结果，额外带 "confidence"
+    """
+    samples: Dict[str, List[Optional[float]]] = {ip: [] for ip in dict.fromkeys(ips)}
+    confidence: Dict[str, float] = {}
+
+    def add_to_cut(cut: CutLine, latencies: List[Optional[float]]) -> None:
+        ok = [ms for ms in latencies if ms is not None]
+        loss = 1 - len(ok) / len(latencies)
+        if ok and loss <= max_loss:
+            cut.add(statistic(ok, stat), loss)
+
+    async def run(targets: List[str], cut: CutLine, update_cut: bool):
+        queue = iter(targets)
+
+        async def worker():
+            for ip in queue:
+                confidence[ip] = await sample_until_confident(
+                    samples[ip], sample_fn, ip, cut, min_samples, max_samples, target, max_loss, stat,
+                )
+                if update_cut:
+                    add_to_cut(cut, samples[ip])
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(targets)))))
+
+    await run(list(samples), CutLine(top_n, max_avg), update_cut=True)
+    for _ in range(refine_passes):
+        # 第一轮早期完成的 IP 用的是当时还不准的分界线，按全部结果重建分界线后补测
+        cut = CutLine(top_n, max_avg)
+        for latencies in samples.values():
+            add_to_cut(cut, latencies)
+        pending = []
+        for ip, latencies in samples.items():
+            ok = [ms for ms in latencies if ms is not None]
+            if ok and not cut.ruled_out(len(latencies) - len(ok), max_samples):
+                confidence[ip] = side_confidence(ok, cut.value(), stat)
+                inside = statistic(ok, stat) <= cut.value()
+                if (inside or confidence[ip] < target) and len(latencies) < max_samples:
+                    pending.append(ip)
+        if not pending:
+            break
+        await run(pending, cut, update_cut=False)
+
+    results = []
+    for ip, latencies in samples.items():
+        r = summarize(ip, latencies)
+        r["confidence"] = confidence.get(ip, 0.0)
+        results.append(r)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自适应测试次数的 TCP 延迟测试")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="测试端口")
+    parser.add_argument("-dn", dest="top_n", type=int, default=10, help="需要的 IP 数")
+    parser.add_argument("-t", dest="max_samples", type=int, default=10, help="每个 IP 最多测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=300, help="并发连接数")
+    parser.add_argument("-tl", dest="max_avg", type=float, default=None, help="平均延迟上限（毫秒）")
+    parser.add_argument("-tlr", dest="max_loss", type=float, default=1.0, help="丢包率上限（0-1）")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("--min", dest="min_samples", type=int, default=3, help="每个 IP 至少测试次数")
+    parser.add_argument("--target", type=float, default=0.95, help="需要达到的置信度")
+    parser.add_argument("--stat", choices=["mean", "p90"], default="mean", help="与分界线比较的统计量")
+    parser.add_argument("--timeout", type=float, default=1.0, help="单次连接超时秒数")
+    args = parser.parse_args()
+
+    raise_nofile_limit(args.concurrency)
+    ips = load_targets(args.file)
+
+    async def sample(ip):
+        return await tcp_connect(ip, args.port, args.timeout)
+
+    start = time.perf_counter()
+    results = asyncio.run(adaptive_probe(
+        ips, sample, args.top_n, args.min_samples, args.max_samples, args.target, args.stat,
+        args.max_loss, args.max_avg, args.concurrency,
+    ))
+    ranked = rank_results(results, args.max_loss, args.max_avg)
+    write_result_csv(ranked, args.output)
+
+    used = sum(r["sent"] for r in results)
+    fixed = len(results) * args.max_samples
+    print(f"测试完成，用时 {time.perf_counter() - start:.2f}s，共 {used} 次测试"
+          f"（固定 {args.max_samples} 次需 {fixed} 次），已保存到 {args.output}")
+    for r in ranked[:args.top_n]:
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  平均延迟 {r['avg']:.2f} ms  测试 {r['sent']} 次  置信度 {r['confidence']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+测速结果的列式历史归档（Arrow IPC，需要 pyarrow）
+- 每次运行的结果追加为一个新文件，按日期（UTC）和运营商分区:
+      archive/date=2026-10-18/carrier=移动/part-<时间戳>-<pid>.arrow
+- 文件不压缩，查询时内存映射，只有用到的分区和列会被读入
+- compact 把分区内的多个小文件合并为一个，并删除超过保留天数的分区
+- latency_by_prefix 回答“移动最近 14 天每个 /24 的延迟中位数”这类问题
+
+用法:
+    python archive.py --append result.csv --carrier 移动
+    python archive.py --query --carrier 移动 --days 14 --prefix 24 --stat median
+    python archive.py --compact --retention 90
+"""
+
+import argparse
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ipset import ips_to_strings, parse_ips
+from results import LOSS_COLUMNS, ResultTable, load_results
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # 只有归档需要 pyarrow，其余脚本不受影响
+    pa = pc = ipc = None
+
+DEFAULT_ROOT = "archive"
+DEFAULT_PORT = 2087
+DAY = 86400
+SENT_COLUMNS = ["已发送"]
+RECEIVED_COLUMNS = ["已接收"]
+
+
+def _schema():
+    return pa.schema([
+        ("ts", pa.timestamp("s", tz="UTC")),
+        ("ip", pa.uint32()),
+        ("port", pa.uint16()),
+        ("sent", pa.uint16()),
+        ("received", pa.uint16()),
+        ("loss", pa.float32()),
+        ("latency", pa.float32()),
+        ("speed", pa.float32()),
+        ("colo", pa.string()),
+    ])
+
+
+def _date(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+def _floats(table: ResultTable, candidates: List[str]) -> Optional[np.ndarray]:
+    name = table.find(candidates)
+    if not name:
+        return None
+    return np.array([np.nan if v is None else v for v in table.numbers(name)], dtype=np.float32)
+
+
+def to_arrow(table: ResultTable, ts: float, default_port: int = DEFAULT_PORT):
+    """
+    把 results.load_results 读取的结果转换为归档的 Arrow 表，两种 CSV 格式都支持，缺少的列为空值
+
+    Raises:
+        ValueError: 存在无效的 IPv4 地址
+    """
+    n = len(table)
+    columns = {
+        "ts": pa.array(np.full(n, int(ts), dtype="datetime64[s]"), type=pa.timestamp("s", tz="UTC")),
+        "ip": pa.array(parse_ips(table.ips)),
+        "port": pa.array(np.array([int(p) for p in table.ports(default_port)], dtype=np.uint16)),
+    }
+    for key, candidates, dtype in (
+        ("sent", SENT_COLUMNS, pa.uint16()),
+        ("received", RECEIVED_COLUMNS, pa.uint16()),
+        ("loss", LOSS_COLUMNS, pa.float32()),
+        ("latency", [table.latency_column or ""], pa.float32()),
+        ("speed", [table.speed_column or ""], pa.float32()),
+    ):
+        values = _floats(table, candidates)
+        if values is None:
+            columns[key] = pa.nulls(n, dtype)
+        else:
+            columns[key] = pa.array(values, from_pandas=True).cast(dtype)  # from_pandas: NaN 记为空值
+    colo = table.colo_column
+    columns["colo"] = pa.array(table.column(colo) if colo else [None] * n, type=pa.string())
+    return pa.table(columns, schema=_schema())
+
+
+def _write(path: str, data) -> None:
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, data.schema) as writer:
+        writer.write_table(data)
+    os.replace(tmp, path)
+
+
+def _read(path: str):
+    """内存映射读取，返回的表直接引用映射的页面，不复制数据"""
+    with pa.memory_map(path) as source:
+        return ipc.open_file(source).read_all()
+
+
+class ResultArchive:
+    """
+    按日期和运营商分区的测速结果归档
+
+    Args:
+        root: 归档目录
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        if pa is None:
+            raise ImportError("归档需要 pyarrow：pip install pyarrow")
+        self.root = root
+
+    def _partition_dir(self, date: str, carrier: str) -> str:
+        return os.path.join(self.root, f"date={date}", f"carrier={carrier}")
+
+    def append(self, table: ResultTable, carrier: str, ts: Optional[float] = None,
+               default_port: int = DEFAULT_PORT) -> str:
+        """
+        追加一次运行的结果
+
+        Returns:
+            写入的文件路径
+        """
+        ts = time.time() if ts is None else ts
+        directory = self._partition_dir(_date(ts), carrier)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{int(ts)}-{os.getpid()}.arrow")
+        _write(path, to_arrow(table, ts, default_port))
+        return path
+
+    def partitions(self, carrier: Optional[str] = None, since: Optional[str] = None,
+                   until: Optional[str] = None) -> Iterator[Tuple[str, str, List[str]]]:
+        """
+        按日期顺序列出分区（只看目录名，不打开文件）
+
+        Args:
+            carrier: 只列出该运营商
+            since / until: 日期范围（含两端），格式 YYYY-MM-DD
+
+        Returns:
+            (日期, 运营商, [文件路径]) 的迭代器
+        """
+        if not os.path.isdir(self.root):
+            return
+        for date_dir in sorted(os.listdir(self.root)):
+            if not date_dir.startswith("date="):
+                continue
+            date = date_dir[5:]
+            if (since and date < since) or (until and date > until):
+                continue
+            for carrier_dir in sorted(os.listdir(os.path.join(self.root, date_dir))):
+                name = carrier_dir[8:] if carrier_dir.startswith("carrier=") else None
+                if name is None or (carrier is not None and name != carrier):
+                    continue
+                directory = os.path.join(self.root, date_dir, carrier_dir)
+                files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".arrow"))
+                if files:
+                    yield date, name, files
+
+    def scan(self, carrier: Optional[str] = None, days: Optional[float] = None,
+             columns: Optional[List[str]] = None, now: Optional[float] = None):
+        """
+        读取最近 days 天（按 UTC 日期，含今天）的结果，各文件内存映射后拼接，不复制数据
+
+        Args:
+            carrier: 运营商，None 为全部
+            days: 天数，None 为全部
+            columns: 只取这些列，默认全部
+
+        Returns:
+            pyarrow.Table
+        """
+        now = time.time() if now is None else now
+        since = _date(now - (days - 1) * DAY) if days else None
+        tables = []
+        for _, _, files in self.partitions(carrier, since):
+            for path in files:
+                data = _read(path)
+                tables.append(data.select(columns) if columns else data)
+        if not tables:
+            schema = _schema()
+            return schema.empty_table().select(columns) if columns else schema.empty_table()
+        return pa.concat_tables(tables)
+
+    def compact(self, retention_days: Optional[float] = 90, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        删除超过保留天数的分区，并把每个分区的多个文件合并为一个（按时间排序）
+
+        Returns:
+            (删除的分区数, 合并的分区数)
+        """
+        now = time.time() if now is None else now
+        removed = merged = 0
+        if retention_days is not None and os.path.isdir(self.root):
+            oldest = _date(now - (retention_days - 1) * DAY)
+            for date_dir in os.listdir(self.root):
+                if date_dir.startswith("date=") and date_dir[5:] < oldest:
+                    shutil.rmtree(os.path.join(self.root, date_dir))
+                    removed += 1
+
+        for _, _, files in list(self.partitions()):
+            if len(files) < 2:
+                continue
+            data = pa.concat_tables([_read(path) for path in files]).sort_by("ts")
+            last = pc.max(data.column("ts")).value
+            target = os.path.join(os.path.dirname(files[0]), f"part-{last}-merged.arrow")
+            _write(target, data)
+            del data
+            for path in files:
+                if path != target:
+                    os.remove(path)
+            merged += 1
+        return removed, merged
+
+
+def group_quantile(keys: np.ndarray, values: np.ndarray, q: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    按 keys 分组求 values 的分位数（线性插值），忽略 NaN
+
+    Returns:
+        (各组的 key（升序）, 各组的有效值个数, 各组的分位数)
+    """
+    ok = ~np.isnan(values)
+    keys, values = keys[ok], values[ok]
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    if len(keys) == 0:
+        return keys, np.empty(0, dtype=np.int64), values
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    pos = starts + (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts + counts - 1)
+    value = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return keys[starts], counts, value
+
+
+STAT_QUANTILES = {"median": 0.5, "p90": 0.9, "p99": 0.99, "min": 0.0}
+
+
+def latency_by_prefix(archive: ResultArchive, carrier: Optional[str] = None, days: Optional[float] = 14,
+                      prefix: int = 24, stat: str = "median", now: Optional[float] = None) -> List[Dict]:
+    """
+    各网段的延迟统计，只读取 ip 和 latency 两列
+
+    Args:
+        archive: 归档
+        carrier: 运营商
+        days: 最近几天
+        prefix: 网段前缀长度
+        stat: median / p90 / p99 / min
+
+    Returns:
+        [{"prefix": "a.b.c.0/24", "samples": 样本数, stat: 毫秒}]，按统计值升序
+    """
+    data = archive.scan(carrier, days, ["ip", "latency"], now)
+    ips = data.column("ip").to_numpy()
+    latency = data.column("latency").to_numpy(zero_copy_only=False).astype(np.float32)  # 空值转为 NaN
+    mask = np.uint32((0xFFFFFFFF << (32 - prefix)) & 0xFFFFFFFF)
+    keys, counts, values = group_quantile(ips & mask, latency, STAT_QUANTILES[stat])
+    order = np.argsort(values, kind="stable")
+    names = ips_to_strings(keys[order])
+    return [
+        {"prefix": f"{name}/{prefix}", "samples": int(count), stat: float(value)}
+        for name, count, value in zip(names, counts[order], values[order])
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测速结果的列式历史归档")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="归档目录")
+    parser.add_argument("--append", metavar="CSV", help="追加一个测速结果文件")
+    parser.add_argument("--carrier", default=None, help="运营商（追加时必填，查询时为过滤条件）")
+    parser.add_argument("-tp", dest="port", type=int, default=DEFAULT_PORT, help="结果中没有端口列时使用的端口")
+    parser.add_argument("--query", action="store_true", help="按网段统计延迟")
+    parser.add_argument("--days", type=float, default=14, help="查询最近几天")
+    parser.add_argument("--prefix", type=int, default=24, help="网段前缀长度")
+    parser.add_argument("--stat", choices=list(STAT_QUANTILES), default="median", help="统计量")
+    parser.add_argument("--top", type=int, default=20, help="显示前几个网段")
+    parser.add_argument("--compact", action="store_true", help="删除过期分区并合并小文件")
+    parser.add_argument("--retention", type=float, default=90, help="保留天数")
+    args = parser.parse_args()
+
+    archive = ResultArchive(args.root)
+    if args.append:
+        if not args.carrier:
+            parser.error("--append 需要 --carrier")
+        table = load_results(args.append)
+        path = archive.append(table, args.carrier, default_port=args.port)
+        print(f"📦 已归档 {len(table)} 条结果到 {path}")
+    if args.compact:
+        removed, merged = archive.compact(args.retention)
+        print(f"🧹 删除 {removed} 个过期分区，合并 {merged} 个分区")
+    if args.query:
+        rows = latency_by_prefix(archive, args.carrier, args.days, args.prefix, args.stat)
+        print(f"最近 {args.days:g} 天 {args.carrier or '全部运营商'}：{len(rows)} 个 /{args.prefix} 网段")
+        for row in rows[:args.top]:
+            print(f" - {row['prefix']:<18} {args.stat} {row[args.stat]:.2f} ms  样本 {row['samples']}")
+
+
+if __name__ == "__main__":
+    main()
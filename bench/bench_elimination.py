@@ -0,0 +1,104 @@
+"""
+逐轮淘汰调度的模拟基准：在合成的延迟分布上比较节省的测试次数与排名准确度
+
+每个候选有真实的平均延迟、抖动和丢包率；“真实前 N 名”按真实丢包率、真实平均延迟排序得出。
+固定次数测试（相当于 CloudflareST -t 8）与逐轮淘汰各自选出前 N 名，比较:
+- 准确度：与真实前 N 名的重合比例
+- 延迟差：选出的 N 个 IP 的真实平均延迟比真实前 N 名高出的比例
+
+用法: python bench/bench_elimination.py [候选数] [N]
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from elimination import rank_key, successive_elimination, total_probes
+from probe import summarize
+
+
+def make_population(n: int, rng: random.Random):
+    """
+    生成合成候选：少数优质 IP（40-80ms），大部分普通 IP（80-250ms），
+    一部分高丢包 IP；抖动与平均延迟成正比
+    """
+    population = {}
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.05:
+            mean = rng.uniform(40, 80)
+        else:
+            mean = rng.uniform(80, 250)
+        loss = rng.choice([0.0] * 8 + [0.05, 0.3]) if kind > 0.02 else 0.0
+        population[f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"] = (mean, mean * rng.uniform(0.05, 0.3), loss)
+    return population
+
+
+def true_top(population, top_n):
+    return set(sorted(population, key=lambda ip: (population[ip][2], population[ip][0]))[:top_n])
+
+
+def mean_latency(population, ips):
+    return sum(population[ip][0] for ip in ips) / len(ips)
+
+
+def make_sampler(population, rng: random.Random):
+    async def sample(ip):
+        mean, jitter, loss = population[ip]
+        if rng.random() < loss:
+            return None
+        return max(1.0, rng.gauss(mean, jitter))
+    return sample
+
+
+def fixed_samples(population, sample_fn, samples, top_n):
+    async def run():
+        results = []
+        for ip in population:
+            results.append(summarize(ip, [await sample_fn(ip) for _ in range(samples)]))
+        return results
+    results = asyncio.run(run())
+    top = sorted(results, key=rank_key)[:top_n]
+    return total_probes(results), {r["ip"] for r in top}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    max_samples = 8
+    trials = 5
+
+    print(f"候选 {n} 个，取前 {top_n} 名，固定测试每个 IP {max_samples} 次，{trials} 次模拟取平均\n")
+    print(f"{'策略':<24} {'总测试次数':>10} {'节省':>7} {'准确度':>7} {'延迟差':>7}")
+
+    configs = [("固定 8 次", None)] + [
+        (f"淘汰 keep={keep} 每轮{per}次", (keep, per))
+        for keep, per in [(0.5, 1), (0.5, 2), (0.3, 2), (0.7, 1)]
+    ]
+    for name, config in configs:
+        probes = accuracy = regret = 0.0
+        for trial in range(trials):
+            rng = random.Random(trial)
+            population = make_population(n, rng)
+            truth = true_top(population, top_n)
+            sample_fn = make_sampler(population, random.Random(1000 + trial))
+            if config is None:
+                used, top = fixed_samples(population, sample_fn, max_samples, top_n)
+            else:
+                keep, per = config
+                results = asyncio.run(successive_elimination(
+                    list(population), sample_fn, top_n, keep, per, max_samples, concurrency=64,
+                ))
+                used, top = total_probes(results), {r["ip"] for r in results[:top_n]}
+            probes += used / trials
+            accuracy += len(top & truth) / top_n / trials
+            regret += (mean_latency(population, top) / mean_latency(population, truth) - 1) / trials
+        saved = 1 - probes / (n * max_samples)
+        print(f"{name:<24} {probes:>10.0f} {saved:>7.0%} {accuracy:>7.0%} {regret:>+7.1%}")
+
+
+if __name__ == "__main__":
+    main()
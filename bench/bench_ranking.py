@@ -0,0 +1,74 @@
+"""
+前 N 名选择基准：比较整表排序后去重取前 N（原来 yd.py / huoqdn.py 的做法）
+与 ranking.select_top（堆选择），以及 numpy 全排序与 ranking.select_top_array（partition）
+
+表在内存中直接构造，不计 CSV 解析时间；IP 取值范围小于行数，以覆盖去重。
+
+用法: python bench/bench_ranking.py [行数] [N]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ranking import CompositeScore, select_top, select_top_array
+from results import ResultTable
+
+
+def make_table(rows: int) -> ResultTable:
+    rng = random.Random(0)
+    columns = ["IP 地址", "已发送", "已接收", "丢包率", "平均延迟", "下载速度(MB/s)", "地区码"]
+    ips = [f"104.{16 + (i >> 16) % 16}.{i >> 8 & 255}.{i & 255}" for i in (rng.randrange(rows) for _ in range(rows))]
+    data = {
+        "IP 地址": ips,
+        "已发送": ["4"] * rows,
+        "已接收": ["4"] * rows,
+        "丢包率": [rng.choice(["0.00", "0.00", "0.00", "0.25"]) for _ in range(rows)],
+        "平均延迟": [f"{rng.uniform(10, 300):.2f}" for _ in range(rows)],
+        "下载速度(MB/s)": [f"{rng.uniform(0, 100):.2f}" for _ in range(rows)],
+        "地区码": [rng.choice(["HKG", "NRT", "LAX", "DFW"]) for _ in range(rows)],
+    }
+    table = ResultTable(columns, data)
+    for name in ("丢包率", "平均延迟", "下载速度(MB/s)"):
+        table.numbers(name)  # 预先解析数值列，两种方式都不计这部分
+    return table
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 9
+    table = make_table(rows)
+    latencies = table.numbers("平均延迟")
+
+    old, old_time = timed(lambda: table.dedupe(table.order_by("平均延迟"))[:n])
+    new, new_time = timed(lambda: select_top(table, n))
+    assert [latencies[i] for i in old] == [latencies[i] for i in new]
+    composite = CompositeScore(loss=1000, speed=2, colo={"HKG": -30})
+    _, composite_time = timed(lambda: select_top(table, n, composite))
+
+    scores = np.asarray(latencies, dtype=np.float64)
+    full, full_time = timed(lambda: np.argsort(scores, kind="stable")[:n])
+    part, part_time = timed(lambda: select_top_array(scores, n))
+    assert (full == part).all()
+
+    print(f"{rows} 行，取前 {n} 个")
+    print(f"  排序 + 去重         {old_time * 1000:>8.0f} ms")
+    print(f"  select_top          {new_time * 1000:>8.0f} ms  ({old_time / new_time:.1f}x)")
+    print(f"  select_top 综合评分 {composite_time * 1000:>8.0f} ms")
+    print(f"  numpy argsort       {full_time * 1000:>8.1f} ms")
+    print(f"  select_top_array    {part_time * 1000:>8.1f} ms  ({full_time / part_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+结果读取的启动与解析基准：比较 pandas.read_csv（原来 xn.py / yd.py 的做法，每个输出函数各读一次）
+与 results.load_results（标准库 csv，进程内缓存）
+
+每种方式在新的 Python 进程中运行（计入 import 耗时），取多次中的最小值。
+除仓库中的 HKG.csv 外，另生成一个较大的 CloudflareST 格式文件。
+
+用法: python bench/bench_result_loader.py [合成文件行数] [重复次数]
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OLD = """
+import pandas as pd
+for _ in range(2):
+    df = pd.read_csv({path!r}, encoding='utf-8')
+    ips = df.iloc[:, 0]
+    order = df.sort_values(by=df.columns[4])
+"""
+
+NEW = """
+import sys
+sys.path.insert(0, {root!r})
+from results import load_results
+for _ in range(2):
+    table = load_results({path!r})
+    ips = table.ips
+    order = table.order_by(4)
+"""
+
+
+def make_csv(path: str, rows: int) -> None:
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n")
+        for i in range(rows):
+            f.write(f"104.{16 + (i >> 16) % 16}.{i >> 8 & 255}.{i & 255},8,8,0.00,"
+                    f"{rng.uniform(10, 300):.2f},{rng.uniform(0, 100):.2f},{rng.choice(['HKG', 'NRT', 'LAX', 'DFW'])}\n")
+
+
+def run(code: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic = os.path.join(tmp, "result.csv")
+        make_csv(synthetic, rows)
+        baseline = run("pass", repeat)
+        print(f"空进程 {baseline * 1000:.0f} ms")
+        print(f"{'文件':<16} {'pandas(ms)':>11} {'results(ms)':>12} {'加速比':>8}")
+        for label, path in (("HKG.csv", os.path.join(ROOT, "HKG.csv")), (f"合成 {rows} 行", synthetic)):
+            old = run(OLD.format(path=path), repeat)
+            new = run(NEW.format(root=ROOT, path=path), repeat)
+            print(f"{label:<16} {old * 1000:>11.0f} {new * 1000:>12.0f} {old / new:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
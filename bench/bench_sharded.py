@@ -0,0 +1,61 @@
+"""
+多进程分片测试的扩展性基准：对本机监听端口测试同一批目标，比较 1 / 2 / 4 / 8 个进程的吞吐
+
+监听进程把 backlog 设得足够大并持续 accept，连接在内核完成握手，测的是探测端本身的开销。
+目标为 127.0.0.0/8 内的地址，全部落到同一个本机端口。
+
+用法: python bench/bench_sharded.py [IP 数] [每个 IP 测试次数] [总并发]
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from probe import probe_sharded, raise_nofile_limit
+
+
+def serve(sock: socket.socket) -> None:
+    while True:
+        conn, _ = sock.accept()
+        conn.close()
+
+
+def start_listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("0.0.0.0", 0))
+    sock.listen(65535)
+    proc = multiprocessing.Process(target=serve, args=(sock,), daemon=True)
+    proc.start()
+    return sock.getsockname()[1], proc
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 800
+    raise_nofile_limit(concurrency * 2)
+    port, listener = start_listener()
+    ips = [f"127.{i >> 16 & 255}.{i >> 8 & 255}.{(i & 255) or 1}" for i in range(1, count + 1)]
+
+    print(f"CPU 核数 {os.cpu_count()}，{count} 个 IP × {samples} 次，总并发 {concurrency}")
+    print(f"{'进程数':>6} {'用时(s)':>9} {'连接/秒':>10} {'成功率':>8} {'加速比':>8}")
+    base = None
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        results = probe_sharded(ips, port, samples, concurrency, timeout=2.0, workers=workers)
+        elapsed = time.perf_counter() - start
+        sent = sum(r["sent"] for r in results)
+        received = sum(r["received"] for r in results)
+        base = base or elapsed
+        print(f"{workers:>6} {elapsed:>9.2f} {sent / elapsed:>10.0f} {received / sent:>8.1%} {base / elapsed:>8.2f}")
+
+    listener.terminate()
+
+
+if __name__ == "__main__":
+    main()
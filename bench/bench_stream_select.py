@@ -0,0 +1,89 @@
+"""
+大结果文件选择的峰值内存基准：比较整表读入（results.load_results + ranking.select_top）
+与分块读取（ranking.stream_select，不分组 / 按数据中心和端口分组）
+
+每种方式在新的 Python 进程中运行，峰值内存取子进程自己报告的 ru_maxrss。
+整表读入在 1000 万行时需要数 GB 内存，默认只测到 --max-load 行。
+
+用法: python bench/bench_stream_select.py [--rows 100000,1000000,10000000] [--max-load 1000000]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+from ranking import load_results, select_top, stream_select
+start = time.perf_counter()
+mode = {mode!r}
+if mode == "import":
+    picked = []
+elif mode == "load":
+    table = load_results({path!r})
+    picked = [table.ips[i] for i in select_top(table, 10)]
+elif mode == "stream":
+    picked = stream_select({path!r}, 10)[()].ips
+else:
+    picked = [ip for t in stream_select({path!r}, 10, group_by=["colo", "port"]).values() for ip in t.ips]
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(picked))
+"""
+
+
+def make_csv(path: str, rows: int) -> None:
+    rng = random.Random(0)
+    colos = ["HKG", "NRT", "LAX", "DFW", "SJC", "SIN"]
+    ports = ["443", "2053", "2083", "2087", "2096", "8443"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码,端口\n")
+        for start in range(0, rows, 100000):
+            f.write("".join(
+                f"{104 + (i >> 24) % 70}.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255},4,4,"
+                f"{rng.choice(('0.00', '0.00', '0.25'))},{rng.uniform(10, 300):.2f},{rng.uniform(0, 100):.2f},"
+                f"{rng.choice(colos)},{rng.choice(ports)}\n"
+                for i in range(start, min(start + 100000, rows))
+            ))
+
+
+def run(mode: str, path: str):
+    out = subprocess.run(
+        [sys.executable, "-c", CODE.format(root=ROOT, mode=mode, path=path)],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(out[0]), int(out[1]) / 1024  # Linux 上 ru_maxrss 的单位为 KB
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分块选择的峰值内存基准")
+    parser.add_argument("--rows", default="100000,1000000,10000000", help="行数，逗号分隔")
+    parser.add_argument("--max-load", type=int, default=1000000, help="整表读入最多测到的行数")
+    args = parser.parse_args()
+
+    _, baseline = run("import", "")
+    print(f"只导入模块的进程峰值内存 {baseline:.0f} MB")
+    print(f"{'行数':>10} {'文件(MB)':>9} {'方式':<14} {'耗时(s)':>8} {'峰值内存(MB)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (int(r) for r in args.rows.split(",")):
+            path = os.path.join(tmp, f"result-{rows}.csv")
+            start = time.perf_counter()
+            make_csv(path, rows)
+            size = os.path.getsize(path) / 1e6
+            print(f"{rows:>10} {size:>9.0f} {'(生成文件)':<14} {time.perf_counter() - start:>8.1f}")
+            for mode in ("load", "stream", "stream-group"):
+                if mode == "load" and rows > args.max_load:
+                    print(f"{rows:>10} {size:>9.0f} {mode:<14} {'跳过':>8}")
+                    continue
+                seconds, peak = run(mode, path)
+                print(f"{rows:>10} {size:>9.0f} {mode:<14} {seconds:>8.1f} {peak:>13.0f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
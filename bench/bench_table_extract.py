@@ -0,0 +1,67 @@
+"""
+表格提取基准测试：页面内一次性提取（bulk） vs 旧的逐行逐格读取（cell）
+
+用法: python bench/bench_table_extract.py [行数 ...]
+默认测试 100、1000、10000 行，输出每种方式的 行/秒
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.sync_api import sync_playwright
+
+from huoq import extract_table_rows, wait_for_today
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "table.html")
+CARRIERS = ["电信", "移动", "联通"]
+
+
+def build_table_html(n_rows: int, today_str: str) -> str:
+    """以 fixtures/table.html 为模板生成 n_rows 行的表格页面"""
+    with open(FIXTURE, encoding="utf-8") as f:
+        template = f.read()
+    head, rest = template.split("<tbody>", 1)
+    _, tail = rest.split("</tbody>", 1)
+
+    rows = []
+    for i in range(n_rows):
+        ip = f"104.{16 + (i >> 16) % 16}.{(i >> 8) & 255}.{i & 255}"
+        rows.append(
+            f"<tr><th>{i + 1}</th><td>{CARRIERS[i % 3]}</td><td>{ip}</td><td>0.00%</td>"
+            f"<td>{10 + i % 90}ms</td><td>{i % 50}MB/s</td><td>100Mb</td><td>HKG</td>"
+            f"<td>{today_str} 11:10:01</td></tr>"
+        )
+    return head + "<tbody>\n" + "\n".join(rows) + "\n</tbody>" + tail
+
+
+def bench(page, mode: str, today_str: str) -> float:
+    start = time.perf_counter()
+    wait_for_today(page, today_str, timeout=60, mode=mode)
+    rows = extract_table_rows(page, mode)
+    elapsed = time.perf_counter() - start
+    return len(rows) / elapsed if elapsed else float("inf")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+    today_str = time.strftime("%Y/%m/%d")
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True, args=["--no-sandbox"])
+        page = browser.new_page()
+
+        print(f"{'行数':>8} {'bulk 行/秒':>14} {'cell 行/秒':>14} {'加速比':>8}")
+        for n in sizes:
+            page.set_content(build_table_html(n, today_str))
+            bulk = bench(page, "bulk", today_str)
+            cell = bench(page, "cell", today_str)
+            print(f"{n:>8} {bulk:>14.0f} {cell:>14.0f} {bulk / cell:>7.1f}x")
+
+        browser.close()
+
+
+if __name__ == "__main__":
+    main()
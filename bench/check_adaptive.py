@@ -0,0 +1,82 @@
+"""
+adaptive.adaptive_probe 的提前停止检查：用模拟的采样函数（不联网）核对各类 IP 的测试次数
+
+- 全部丢包的 IP：前 N 名都不丢包后第一次丢包就停止；还没有分界线时（只有全部丢包的 IP），
+  -tlr 1.0（默认，允许任意丢包）下也只测 min_samples 次
+- 丢包多的 IP：最迟在第一次丢包时停止（也可能先因延迟确定落选），不会测满
+- 稳定的快 IP：测满 max_samples 次，并且正好是前 N 名
+- 总测试次数远少于固定 max_samples 次
+
+全部通过时输出 ✅，否则以 AssertionError 退出。
+
+用法: python bench/check_adaptive.py [每类 IP 数] [N]
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adaptive import adaptive_probe
+from probe import rank_results
+
+MIN_SAMPLES = 3
+MAX_SAMPLES = 10
+
+
+def main():
+    per_kind = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    fast = [f"10.0.{i >> 8}.{i & 255}" for i in range(top_n)]
+    slow = [f"10.1.{i >> 8}.{i & 255}" for i in range(per_kind)]
+    lossy = [f"10.2.{i >> 8}.{i & 255}" for i in range(per_kind)]
+    dead = [f"10.3.{i >> 8}.{i & 255}" for i in range(per_kind)]
+    rng = random.Random(0)
+
+    async def sample(ip):
+        if ip in dead_set:
+            return None
+        if ip in lossy_set:
+            return None if rng.random() < 0.5 else rng.gauss(60, 5)
+        if ip in fast_set:
+            return rng.gauss(40, 2)
+        return rng.gauss(200, 20)
+
+    fast_set, lossy_set, dead_set = set(fast), set(lossy), set(dead)
+    # 快 IP 排在最前，分界线（第 N 名的延迟和丢包率）在第一轮很早就确定
+    results = asyncio.run(adaptive_probe(
+        fast + slow + lossy + dead, sample, top_n, MIN_SAMPLES, MAX_SAMPLES, concurrency=top_n,
+    ))
+    by_ip = {r["ip"]: r for r in results}
+
+    for ip in dead:
+        r = by_ip[ip]
+        assert r["sent"] == 1 and r["received"] == 0 and r["confidence"] == 1.0, r
+    print(f"✅ 全部丢包（有分界线）: {len(dead)} 个 IP 各测 1 次")
+
+    only_dead = asyncio.run(adaptive_probe(dead, sample, top_n, MIN_SAMPLES, MAX_SAMPLES, concurrency=top_n))
+    for r in only_dead:
+        assert r["sent"] == MIN_SAMPLES and r["received"] == 0 and r["confidence"] == 1.0, r
+    print(f"✅ 全部丢包（无分界线）: {len(only_dead)} 个 IP 各测 {MIN_SAMPLES} 次")
+
+    for ip in lossy:
+        r = by_ip[ip]
+        assert r["sent"] - r["received"] <= 1 and r["sent"] < MAX_SAMPLES, r
+    print(f"✅ 丢包多: 平均测 {sum(by_ip[ip]['sent'] for ip in lossy) / len(lossy):.1f} 次，最多丢包 1 次就停止")
+
+    for ip in fast:
+        assert by_ip[ip]["sent"] == MAX_SAMPLES, by_ip[ip]
+    ranked = rank_results(results, 1.0, None)
+    assert {r["ip"] for r in ranked[:top_n]} == fast_set, ranked[:top_n]
+    print(f"✅ 前 {top_n} 名正确，各测满 {MAX_SAMPLES} 次")
+
+    used = sum(r["sent"] for r in results)
+    fixed = len(results) * MAX_SAMPLES
+    assert used < fixed / 2, (used, fixed)
+    print(f"✅ 共 {used} 次测试（固定 {MAX_SAMPLES} 次需 {fixed} 次）")
+
+
+if __name__ == "__main__":
+    main()
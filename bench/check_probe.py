@@ -0,0 +1,91 @@
+"""
+probe.probe_many 的端到端检查：在本机起一个 asyncio 监听端口，再找一个没有监听的端口，
+对两者做 TCP 握手测试，核对丢包率和延迟字段
+
+- 监听端口：全部成功，丢包率 0，平均延迟大于 0 且不超过超时时间
+- 关闭的端口：连接被拒绝，全部丢包，平均延迟为 None
+- 样本写入 stats.SampleMatrix 时结果只带行号，矩阵中的样本完整，能算出统计量
+- probe_many_ports 同时测试两个端口时选中监听端口
+
+全部通过时输出 ✅，否则以 AssertionError 退出。
+
+用法: python bench/check_probe.py [每个 IP 测试次数] [超时秒数]
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from probe import probe_many, probe_many_ports
+from stats import SampleMatrix, attach_stats
+
+IPS = ["127.0.0.1", "127.0.0.2", "127.0.0.3"]
+
+
+def closed_port() -> int:
+    """绑定一个临时端口后立即关闭，短时间内不会有进程监听该端口"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("0.0.0.0", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    writer.close()
+
+
+async def check(samples: int, timeout: float) -> None:
+    server = await asyncio.start_server(handle, "0.0.0.0", 0)
+    port = server.sockets[0].getsockname()[1]
+    closed = closed_port()
+    try:
+        opened = await probe_many(IPS, port, samples, concurrency=4, timeout=timeout)
+        refused = await probe_many(IPS, closed, samples, concurrency=4, timeout=timeout)
+        matrix = SampleMatrix(len(IPS), samples)
+        in_matrix = await probe_many(IPS, port, samples, concurrency=4, timeout=timeout, matrix=matrix)
+        both = await probe_many_ports(IPS, [closed, port], samples, concurrency=4, timeout=timeout)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert sorted(r["ip"] for r in opened) == IPS
+    for r in opened:
+        assert r["sent"] == r["received"] == samples, r
+        assert r["loss"] == 0, r
+        assert 0 < r["avg"] <= timeout * 1000, r
+        assert len(r["samples"]) == samples and None not in r["samples"], r
+    print(f"✅ 监听端口 {port}: " + ", ".join(f"{r['ip']} {r['avg']:.2f} ms" for r in opened))
+
+    assert sorted(r["ip"] for r in refused) == IPS
+    for r in refused:
+        assert r["sent"] == samples and r["received"] == 0, r
+        assert r["loss"] == 1.0, r
+        assert r["avg"] is None, r
+        assert r["samples"] == [None] * samples, r
+    print(f"✅ 关闭的端口 {closed}: 全部丢包")
+
+    attach_stats(in_matrix, matrix=matrix)
+    for r in in_matrix:
+        assert "samples" not in r and r["loss"] == 0, r
+        assert matrix.sent[r["row"]] == samples and None not in matrix.samples(r["row"]), r
+        assert r["median"] is not None and r["p99"] >= r["median"], r
+    print("✅ SampleMatrix: " + ", ".join(f"{r['ip']} 中位数 {r['median']:.2f} ms" for r in in_matrix))
+
+    for r in both:
+        assert r["port"] == port and r["loss"] == 0, r
+        assert r["ports"][closed]["loss"] == 1.0 and r["ports"][closed]["avg"] is None, r
+    print("✅ probe_many_ports: 每个 IP 都选中监听端口")
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    asyncio.run(check(samples, timeout))
+
+
+if __name__ == "__main__":
+    main()
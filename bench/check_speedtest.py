@@ -0,0 +1,90 @@
+"""
+speedtest.download_speed 的端到端检查：在本机起一个按目标地址限速的 HTTP 服务，核对提前结束和全局带宽预算
+
+- 127.0.0.1 以 FAST MB/s 发送：设置下限 LIMIT 时两个窗口后提前结束为 pass，报告的速度不低于下限
+- 127.0.0.2 以 SLOW MB/s 发送（不到下限的一半）：两个窗口后提前结束为 fail，报告的速度低于下限
+- 不设置下限时测满 duration 秒（stopped 为 time）
+- test_many 同时测试快慢两个 IP、设置 --budget 时，合计吞吐不超过预算（令牌桶的初始额度之外），
+  慢连接用不完的额度由快连接用掉
+
+全部通过时输出 ✅，否则以 AssertionError 退出。
+
+用法: python bench/check_speedtest.py [窗口秒数]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speedtest import MB, READ_SIZE, download_speed, test_many
+
+FAST = 4.0
+SLOW = 0.3
+LIMIT = 1.0
+BUDGET = 1.0
+TICK = 0.02
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """按本端地址决定发送速率，每 TICK 秒写一块，直到客户端断开"""
+    await reader.readuntil(b"\r\n\r\n")
+    rate = FAST if writer.get_extra_info("sockname")[0] == "127.0.0.1" else SLOW
+    chunk = b"0" * int(rate * MB * TICK)
+    writer.write(b"HTTP/1.1 200 OK\r\ncf-ray: 8c2a6f0d3b5e1234-hkg\r\nConnection: close\r\n\r\n")
+    try:
+        while True:
+            writer.write(chunk)
+            await writer.drain()
+            await asyncio.sleep(TICK)
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def check(window: float) -> None:
+    server = await asyncio.start_server(handle, "0.0.0.0", 0)
+    url = f"http://speed.test:{server.sockets[0].getsockname()[1]}/"
+    try:
+        fast = await download_speed("127.0.0.1", url, 10, LIMIT, window)
+        slow = await download_speed("127.0.0.2", url, 10, LIMIT, window)
+        full = await download_speed("127.0.0.2", url, 3 * window, None, window)
+        start = time.perf_counter()
+        shared = await test_many(["127.0.0.1", "127.0.0.2"], url, 2, 2, 3.0, None, BUDGET)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.close()
+
+    for r in (fast, slow, full, *shared):
+        assert r["error"] is None and r["colo"] == "HKG", r
+
+    assert fast["stopped"] == "pass" and fast["speed"] >= LIMIT, fast
+    assert fast["elapsed"] < 4 * window, fast
+    print(f"✅ 提前达标: {fast['speed']:.2f} MB/s，用时 {fast['elapsed']:.2f}s")
+
+    assert slow["stopped"] == "fail" and slow["speed"] < LIMIT / 2, slow
+    assert slow["elapsed"] < 4 * window, slow
+    print(f"✅ 提前淘汰: {slow['speed']:.2f} MB/s，用时 {slow['elapsed']:.2f}s")
+
+    assert full["stopped"] == "time" and full["elapsed"] >= 3 * window * 0.95, full
+    assert abs(full["speed"] - SLOW) < SLOW * 0.3, full
+    print(f"✅ 未设置下限时测满: {full['speed']:.2f} MB/s，用时 {full['elapsed']:.2f}s")
+
+    total = sum(r["bytes"] for r in shared)
+    # 令牌桶初始是满的；每个连接先读再扣额度，最多多读一块
+    allowed = BUDGET * MB * elapsed + max(BUDGET * MB * 0.1, READ_SIZE) + READ_SIZE * len(shared)
+    assert total <= allowed, (total, allowed)
+    assert total >= BUDGET * MB * elapsed * 0.7, (total, elapsed)
+    print(f"✅ 全局预算 {BUDGET:g} MB/s: 合计 {total / elapsed / MB:.2f} MB/s（不限制时约 {FAST + SLOW:g} MB/s）")
+
+
+def main():
+    window = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    asyncio.run(check(window))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+tls.tls_probe_many 的端到端检查：用 openssl 生成自签名证书，在本机起一个 TLS 服务，
+核对每个 IP 第一次完整握手之后的每次测试都复用了会话
+
+- 分别限制服务端为 TLS 1.2（会话 ID / 票据）和 TLS 1.3（握手后下发的票据）
+- 每个 IP 的 tls_resumed_count 为 测试次数 - 1，全部成功、丢包率 0
+- 首次握手、复用握手、首字节三个字段都有值
+- 另外直接调用 tls_sample 逐次核对：第一次 session_reused 为 False，之后都为 True
+
+需要 openssl 命令行工具。全部通过时输出 ✅，否则以 AssertionError 退出。
+
+用法: python bench/check_tls.py [每个 IP 测试次数]
+"""
+
+import asyncio
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tls import make_context, tls_probe_many, tls_sample
+
+HOST = "tls.test"
+IPS = ["127.0.0.1", "127.0.0.2", "127.0.0.3"]
+VERSIONS = {"TLS 1.2": ssl.TLSVersion.TLSv1_2, "TLS 1.3": ssl.TLSVersion.TLSv1_3}
+
+
+def make_cert(directory: str):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", f"/CN={HOST}", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = b"colo=HKG\n"
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def check(name: str, version: ssl.TLSVersion, cert: str, key: str, samples: int) -> None:
+    server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_ctx.load_cert_chain(cert, key)
+    server_ctx.minimum_version = server_ctx.maximum_version = version
+    server = await asyncio.start_server(handle, "0.0.0.0", 0, ssl=server_ctx)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        results = await tls_probe_many(IPS, port, HOST, samples, concurrency=3, timeout=3.0, verify=False)
+        ctx, session, reused = make_context(verify=False), None, []
+        for _ in range(samples):
+            r = await tls_sample(IPS[0], port, HOST, ctx, session)
+            reused.append(r["resumed"])
+            session = r["session"] or session
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert sorted(r["ip"] for r in results) == IPS
+    for r in results:
+        assert r["received"] == samples and r["loss"] == 0, r
+        assert r["tls_resumed_count"] == samples - 1, r
+        assert r["tls_handshake"] is not None and r["tls_resumed"] is not None and r["ttfb"] is not None, r
+    assert reused == [False] + [True] * (samples - 1), reused
+    print(f"✅ {name}: " + ", ".join(
+        f"{r['ip']} 完整握手 {r['tls_handshake']:.2f} ms / 复用 {r['tls_resumed']:.2f} ms × {r['tls_resumed_count']}"
+        for r in sorted(results, key=lambda r: r["ip"])
+    ))
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_cert(tmp)
+        for name, version in VERSIONS.items():
+            asyncio.run(check(name, version, cert, key, samples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+候选 IP 生成：把 CIDR 列表（如 iphome.txt）展开成测速用的候选列表
+- 全部运算基于 uint32 整数数组（NumPy），不为每个地址创建 ipaddress 对象
+- 支持按 /24 分层抽样（每个 /24 取 N 个，排除 .0 网络地址和 .255 广播地址）
+- 支持随机种子复现、排除列表
+- 分块流式写出，不会一次性生成数百万个字符串
+
+环境变量:
+    CANDIDATE_PER_24   每个 /24 抽取的地址数，0 表示展开全部地址，默认 1
+    CANDIDATE_SEED     随机种子，默认不固定
+    CANDIDATE_EXCLUDE  排除列表文件（IP / CIDR，每行一个）
+    CANDIDATE_OUTPUT   输出文件，默认 ip.txt
+
+用法: python candidates.py iphome.txt [更多 CIDR 文件 ...]
+"""
+
+import os
+import sys
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from ipset import format_ips, in_ranges, load_ranges
+
+DEFAULT_CHUNK = 1 << 20
+
+
+def _blocks(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    列出区间覆盖的所有 /24，以及每个 /24 内可用主机地址的范围（排除 .0 和 .255）
+
+    Returns:
+        (/24 基地址, 可用起始地址, 可用结束地址)，均为 int64
+    """
+    first = starts.astype(np.int64) >> 8
+    last = ends.astype(np.int64) >> 8
+    counts = last - first + 1
+    range_idx = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    base = (first[range_idx] + offsets) << 8
+    lo = np.maximum(starts.astype(np.int64)[range_idx], base + 1)
+    hi = np.minimum(ends.astype(np.int64)[range_idx], base + 254)
+    return base, lo, hi
+
+
+def sample_per_24(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    per_block: int,
+    seed: Optional[int] = None,
+    exclude: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    chunk_blocks: int = 4096,
+) -> Iterator[np.ndarray]:
+    """
+    按 /24 分层抽样，每个 /24 不放回地随机抽取 per_block 个主机地址
+
+    排除列表在抽样之后过滤，因此被排除的 /24 中实际抽到的地址可能少于 per_block
+
+    Args:
+        starts, ends: ipset.parse_ranges 返回的区间
+        per_block: 每个 /24 抽取的地址数（最多 254）
+        seed: 随机种子，相同种子得到相同结果
+        exclude: 需要排除的区间 (starts, ends)
+        chunk_blocks: 每次处理的 /24 数量
+
+    Yields:
+        uint32 地址数组，每块按 /24 顺序排列
+    """
+    rng = np.random.default_rng(seed)
+    base, lo, hi = _blocks(starts, ends)
+    per_block = min(per_block, 254)
+    slots = np.arange(254)
+
+    for i in range(0, len(base), chunk_blocks):
+        block_lo, block_hi = lo[i:i + chunk_blocks], hi[i:i + chunk_blocks]
+        counts = block_hi - block_lo + 1
+        # 每个候选位置一个随机键，取最小的 per_block 个即为不放回抽样；超出可用范围的位置键为无穷大
+        keys = rng.random((len(block_lo), 254), dtype=np.float32)
+        keys[slots[None, :] >= counts[:, None]] = np.inf
+        if per_block < 254:
+            picked = np.argpartition(keys, per_block - 1, axis=1)[:, :per_block]
+        else:
+            picked = np.broadcast_to(slots, keys.shape).copy()
+        picked.sort(axis=1)
+        # 可用地址少于 per_block 的 /24 会选中超出范围的位置，这里去掉
+        valid = picked < counts[:, None]
+        addrs = (block_lo[:, None] + picked)[valid].astype(np.uint32)
+        if exclude is not None:
+            addrs = addrs[~in_ranges(addrs, *exclude)]
+        yield addrs
+
+
+def expand_all(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    skip_edges: bool = True,
+    exclude: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    chunk_size: int = DEFAULT_CHUNK,
+) -> Iterator[np.ndarray]:
+    """
+    展开区间内的全部地址
+
+    Args:
+        starts, ends: ipset.parse_ranges 返回的区间
+        skip_edges: 是否跳过每个 /24 的 .0 和 .255
+        exclude: 需要排除的区间 (starts, ends)
+        chunk_size: 每块最多的地址数
+
+    Yields:
+        uint32 地址数组
+    """
+    for start, end in zip(starts.astype(np.int64), ends.astype(np.int64)):
+        for chunk_start in range(int(start), int(end) + 1, chunk_size):
+            addrs = np.arange(chunk_start, min(chunk_start + chunk_size, int(end) + 1), dtype=np.uint32)
+            if skip_edges:
+                last_octet = addrs & 255
+                addrs = addrs[(last_octet != 0) & (last_octet != 255)]
+            if exclude is not None:
+                addrs = addrs[~in_ranges(addrs, *exclude)]
+            yield addrs
+
+
+def write_ips(chunks: Iterable[np.ndarray], path: str) -> int:
+    """
+    流式写出地址块
+
+    Returns:
+        写出的地址数
+    """
+    total = 0
+    with open(path, "wb") as f:
+        for addrs in chunks:
+            f.write(format_ips(addrs))
+            total += len(addrs)
+    return total
+
+
+def main():
+    paths = sys.argv[1:] or ["iphome.txt"]
+    per_block = int(os.environ.get("CANDIDATE_PER_24", "1"))
+    seed = os.environ.get("CANDIDATE_SEED")
+    exclude_path = os.environ.get("CANDIDATE_EXCLUDE")
+    output = os.environ.get("CANDIDATE_OUTPUT", "ip.txt")
+
+    start = time.perf_counter()
+    starts, ends = load_ranges(*paths)
+    exclude = load_ranges(exclude_path) if exclude_path else None
+
+    if per_block > 0:
+        chunks = sample_per_24(starts, ends, per_block, seed=int(seed) if seed else None, exclude=exclude)
+    else:
+        chunks = expand_all(starts, ends, exclude=exclude)
+    total = write_ips(chunks, output)
+    print(f"从 {', '.join(paths)} 生成 {total} 个候选 IP，已保存到 {output}，用时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+数据中心（colo）识别与网段索引
+- 对 IP 发一个轻量的 /cdn-cgi/trace 请求，从响应头 cf-ray 的后缀（如 -HKG）得到数据中心
+- 结果按 /24 记入索引文件，同一 /24 通常落在同一个数据中心
+- 之后的运行可以在任何测试之前只保留想要的数据中心（如 HKG、NRT）的候选
+- 索引是排好序的 uint32 前缀数组，用 numpy.searchsorted 批量查询，百万级 IP 只需毫秒
+
+用法:
+    python colo.py -f ip.txt -tp 80 -o colo_index.npz           # 探测并更新索引
+    python colo.py -f ip.txt --want HKG,NRT --filter ip_hkg.txt   # 只按索引过滤，不探测
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import ssl
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ipset import parse_ips
+from probe import load_targets, raise_nofile_limit
+from speedtest import parse_colo
+
+DEFAULT_INDEX = "colo_index.npz"
+TRACE_HOST = "cloudflare.com"
+TRACE_PATH = "/cdn-cgi/trace"
+# Cloudflare 支持 HTTPS 的端口，其余端口按明文 HTTP 请求
+TLS_PORTS = {443, 2053, 2083, 2087, 2096, 8443}
+# 读取 trace 响应的字节上限，正常的响应只有几百字节
+MAX_RESPONSE = 64 * 1024
+
+
+async def read_response(reader: asyncio.StreamReader, limit: int = MAX_RESPONSE) -> bytes:
+    """读到连接关闭（请求带 Connection: close）或达到 limit 字节；响应可能分成多个 TLS 记录或 TCP 段到达"""
+    chunks = []
+    size = 0
+    while size < limit:
+        chunk = await reader.read(limit - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+
+async def fetch_colo(
+    ip: str,
+    port: int = 80,
+    host: str = TRACE_HOST,
+    timeout: float = 3.0,
+) -> Optional[str]:
+    """
+    请求 http(s)://host/cdn-cgi/trace（直连 ip），返回数据中心代码
+
+    优先使用 cf-ray 响应头，没有时再从 trace 正文的 colo= 行中读取
+
+    Returns:
+        数据中心代码（如 HKG），失败返回 None
+    """
+    ssl_ctx = None
+    if port in TLS_PORTS:
+        ssl_ctx = ssl.create_default_context()
+        ssl_ctx.check_hostname = False
+        ssl_ctx.verify_mode = ssl.CERT_NONE
+
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip, port, ssl=ssl_ctx, server_hostname=host if ssl_ctx else None), timeout
+        )
+        writer.write(
+            f"GET {TRACE_PATH} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+            f"Accept: */*\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(read_response(reader), timeout)
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+    head, _, body = response.decode("latin-1").partition("\r\n\r\n")
+    for line in head.split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "cf-ray":
+            colo = parse_colo(value.strip())
+            if colo:
+                return colo
+    for line in body.splitlines():
+        if line.startswith("colo="):
+            return line[5:].strip().upper() or None
+    return None
+
+
+async def fetch_colos(
+    ips: Iterable[str],
+    port: int = 80,
+    host: str = TRACE_HOST,
+    concurrency: int = 200,
+    timeout: float = 3.0,
+) -> Dict[str, str]:
+    """并发识别一批 IP 的数据中心，只返回识别成功的 {ip: colo}"""
+    targets = iter(ips)
+    colos: Dict[str, str] = {}
+
+    async def worker():
+        for ip in targets:
+            colo = await fetch_colo(ip, port, host, timeout)
+            if colo:
+                colos[ip] = colo
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return colos
+
+
+class ColoIndex:
+    """
+    /24 前缀 → 数据中心 的索引
+
+    内部是三个按前缀排序的数组：前缀（uint32）、数据中心编号（uint16，对应 names）、
+    最近一次观测时间；同一前缀后写入的观测覆盖旧的
+    """
+
+    def __init__(self, prefix: int = 24):
+        self.shift = np.uint32(32 - prefix)
+        self.prefix = prefix
+        self.keys = np.empty(0, dtype=np.uint32)
+        self.codes = np.empty(0, dtype=np.uint16)
+        self.seen = np.empty(0, dtype=np.float64)
+        self.names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX) -> "ColoIndex":
+        """读取索引文件，文件不存在时返回空索引"""
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(int(data["prefix"]))
+            index.keys, index.codes, index.seen = data["keys"], data["codes"], data["seen"]
+            index.names = [str(n) for n in data["names"]]
+        return index
+
+    def save(self, path: str = DEFAULT_INDEX) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp, prefix=np.int64(self.prefix), keys=self.keys, codes=self.codes, seen=self.seen,
+            names=np.array(self.names, dtype=str),
+        )
+        os.replace(tmp, path)
+
+    def _code(self, colo: str) -> int:
+        try:
+            return self.names.index(colo)
+        except ValueError:
+            self.names.append(colo)
+            return len(self.names) - 1
+
+    def update(self, colos: Dict[str, str], ts: Optional[float] = None) -> None:
+        """
+        记入一批观测 {ip: colo}
+
+        Args:
+            colos: IP 到数据中心代码的映射
+            ts: 观测时间，默认为当前时间
+        """
+        if not colos:
+            return
+        ts = time.time() if ts is None else ts
+        new_keys = parse_ips(colos) >> self.shift
+        new_codes = np.array([self._code(c.upper()) for c in colos.values()], dtype=np.uint16)
+
+        keys = np.concatenate([self.keys, new_keys])
+        codes = np.concatenate([self.codes, new_codes])
+        seen = np.concatenate([self.seen, np.full(len(new_keys), ts)])
+        # 稳定排序后每个前缀取最后一条，即最新的观测
+        order = np.argsort(keys, kind="stable")
+        keys, codes, seen = keys[order], codes[order], seen[order]
+        last = np.r_[keys[1:] != keys[:-1], True]
+        self.keys, self.codes, self.seen = keys[last], codes[last], seen[last]
+
+    def update_from_csv(self, path: str) -> int:
+        """
+        从已有的测速结果中导入数据中心
+
+        支持 CloudflareST 的 result.csv / HKG.csv（地区码）和
+        dianxin.csv / yidong.csv（数据中心）两种格式，DX 等非机场代码的值会被忽略
+
+        Returns:
+            导入的条数
+        """
+        colos = {}
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                ip = (row.get("IP 地址") or row.get("IP地址") or "").strip()
+                colo = (row.get("地区码") or row.get("数据中心") or "").strip().upper()
+                if ip and len(colo) == 3 and colo.isalpha():
+                    colos[ip] = colo
+        self.update(colos, os.path.getmtime(path))
+        return len(colos)
+
+    def lookup(self, addrs: np.ndarray) -> np.ndarray:
+        """
+        批量查询 uint32 地址的数据中心编号
+
+        Returns:
+            与 addrs 等长的 int32 数组，值为 names 中的下标，未知为 -1
+        """
+        keys = np.asarray(addrs, dtype=np.uint32) >> self.shift
+        pos = np.searchsorted(self.keys, keys)
+        pos_clipped = np.minimum(pos, max(len(self.keys) - 1, 0))
+        found = (pos < len(self.keys)) & (self.keys[pos_clipped] == keys) if len(self.keys) else np.zeros(len(keys), bool)
+        result = np.full(len(keys), -1, dtype=np.int32)
+        result[found] = self.codes[pos_clipped[found]]
+        return result
+
+    def colo_of(self, ips: List[str]) -> List[str]:
+        """查询 IP 字符串的数据中心代码，未知为空字符串"""
+        names = self.names + [""]
+        return [names[c] for c in self.lookup(parse_ips(ips))]
+
+    def filter(self, addrs: np.ndarray, wanted: Iterable[str], keep_unknown: bool = False) -> np.ndarray:
+        """
+        只保留属于 wanted 数据中心的地址
+
+        Args:
+            addrs: uint32 地址数组
+            wanted: 想要的数据中心代码
+            keep_unknown: 是否保留索引中没有记录的地址
+        """
+        wanted_codes = [self.names.index(c) for c in {w.upper() for w in wanted} if c in self.names]
+        codes = self.lookup(addrs)
+        mask = np.isin(codes, wanted_codes)
+        if keep_unknown:
+            mask |= codes < 0
+        return np.asarray(addrs, dtype=np.uint32)[mask]
+
+    def counts(self) -> List[Tuple[str, int]]:
+        """每个数据中心的前缀数，从多到少"""
+        totals = np.bincount(self.codes, minlength=len(self.names))
+        return sorted(((self.names[i], int(n)) for i, n in enumerate(totals) if n), key=lambda x: -x[1])
+
+
+def filter_ips(ips: List[str], index: ColoIndex, wanted: Iterable[str], keep_unknown: bool = False) -> List[str]:
+    """按索引过滤 IP 字符串，保持原有顺序"""
+    addrs = parse_ips(ips)
+    keep = set(index.filter(addrs, wanted, keep_unknown).tolist())
+    return [ip for ip, addr in zip(ips, addrs.tolist()) if addr in keep]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据中心识别与 /24 索引")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-tp", dest="port", type=int, default=80, help="请求端口，443/2053/2083/2087/2096/8443 使用 HTTPS")
+    parser.add_argument("-n", dest="concurrency", type=int, default=200, help="并发请求数")
+    parser.add_argument("-o", dest="index", default=DEFAULT_INDEX, help="索引文件")
+    parser.add_argument("--host", default=TRACE_HOST, help="请求使用的域名（Host / SNI）")
+    parser.add_argument("--timeout", type=float, default=3.0, help="单次请求超时秒数")
+    parser.add_argument("--import", dest="imports", action="append", default=[], help="从已有测速结果 CSV 导入，可重复")
+    parser.add_argument("--want", default="", help="想要的数据中心，逗号分隔，如 HKG,NRT")
+    parser.add_argument("--filter", dest="filter_out", default=None, help="只按索引过滤目标并写出，不探测")
+    parser.add_argument("--keep-unknown", action="store_true", help="过滤时保留索引中没有记录的 IP")
+    args = parser.parse_args()
+
+    index = ColoIndex.load(args.index)
+    for path in args.imports:
+        print(f"📥 从 {path} 导入 {index.update_from_csv(path)} 条")
+
+    ips = load_targets(args.file)
+    wanted = [w.strip() for w in args.want.split(",") if w.strip()]
+
+    if args.filter_out:
+        start = time.perf_counter()
+        kept = filter_ips(ips, index, wanted, args.keep_unknown)
+        with open(args.filter_out, "w", encoding="utf-8") as f:
+            f.write("\n".join(kept) + ("\n" if kept else ""))
+        print(f"过滤完成，用时 {time.perf_counter() - start:.3f}s，保留 {len(kept)}/{len(ips)} 个，已保存到 {args.filter_out}")
+    else:
+        raise_nofile_limit(args.concurrency)
+        print(f"开始识别数据中心: {len(ips)} 个 IP，端口 {args.port}，并发 {args.concurrency}")
+        start = time.perf_counter()
+        colos = asyncio.run(fetch_colos(ips, args.port, args.host, args.concurrency, args.timeout))
+        index.update(colos)
+        print(f"识别完成，用时 {time.perf_counter() - start:.2f}s，成功 {len(colos)}/{len(ips)} 个")
+
+    if args.imports or not args.filter_out:
+        index.save(args.index)
+        summary = "，".join(f"{name} {n}" for name, n in index.counts()[:10])
+        print(f"✅ 索引共 {len(index)} 个 /{index.prefix}，已保存到 {args.index}: {summary}")
+
+
+if __name__ == "__main__":
+    main()
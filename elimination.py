@@ -0,0 +1,124 @@
+"""
+逐轮淘汰的延迟测试调度（successive halving）
+- 每轮对剩余候选各测几次，按丢包率、平均延迟排名后淘汰最差的一部分
+- 测试次数集中在有竞争力的候选上，用远少于固定 -t 次的总测试量得到相同的前 N 名
+- 采样函数可替换，便于用模拟延迟分布评估（见 bench/bench_elimination.py）
+
+用法:
+    python elimination.py -f ip.txt -tp 2087 -dn 10 -t 8 -o result.csv
+"""
+
+import argparse
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from probe import load_targets, raise_nofile_limit, summarize, tcp_connect, write_result_csv
+
+SampleFn = Callable[[str], Awaitable[Optional[float]]]
+
+
+def rank_key(result: Dict):
+    """排名依据：丢包率优先，其次平均延迟（与 CloudflareST 一致）"""
+    return result["loss"], result["avg"] if result["avg"] is not None else math.inf
+
+
+async def successive_elimination(
+    ips: List[str],
+    sample_fn: SampleFn,
+    top_n: int = 10,
+    keep_fraction: float = 0.5,
+    samples_per_round: int = 1,
+    max_samples: int = 8,
+    concurrency: int = 300,
+) -> List[Dict]:
+    """
+    逐轮测试并淘汰候选
+
+    每轮对所有剩余候选各采样 samples_per_round 次，然后只保留排名前
+    max(top_n, 剩余数 × keep_fraction) 个；剩余数不超过 top_n 或
+    每个候选的采样数达到 max_samples 时结束
+
+    Args:
+        ips: 候选 IP
+        sample_fn: 采样函数，返回一次延迟（毫秒），失败返回 None
+        top_n: 需要的 IP 数
+        keep_fraction: 每轮保留的比例
+        samples_per_round: 每轮每个候选的采样次数
+        max_samples: 每个候选最多采样次数（相当于固定测试时的 -t）
+        concurrency: 同时进行的采样数
+
+    Returns:
+        全部候选的 summarize 结果，额外带 "round"（被淘汰的轮次，留到最后的为总轮数）；
+        按存活轮次从多到少、同轮内按丢包率和平均延迟排序，前 top_n 个即为结果
+    """
+    samples: Dict[str, List[Optional[float]]] = {ip: [] for ip in dict.fromkeys(ips)}
+    alive = list(samples)
+    eliminated: List[List[Dict]] = []  # 每轮被淘汰的候选
+    round_no = 0
+
+    while alive:
+        round_no += 1
+        jobs = iter([ip for ip in alive for _ in range(samples_per_round)])
+
+        async def worker():
+            for ip in jobs:
+                samples[ip].append(await sample_fn(ip))
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(alive) * samples_per_round))))
+
+        ranked = sorted((summarize(ip, samples[ip]) for ip in alive), key=rank_key)
+        done = len(ranked) <= top_n or len(samples[alive[0]]) >= max_samples
+        keep = len(ranked) if done else max(top_n, math.ceil(len(ranked) * keep_fraction))
+        for r in ranked:
+            r["round"] = round_no
+        eliminated.append(ranked[keep:])
+        if done:
+            return ranked + [r for group in reversed(eliminated) for r in group]
+        alive = [r["ip"] for r in ranked[:keep]]
+
+    return []
+
+
+def total_probes(results: List[Dict]) -> int:
+    return sum(r["sent"] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐轮淘汰的 TCP 延迟测试")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="测试端口")
+    parser.add_argument("-dn", dest="top_n", type=int, default=10, help="需要的 IP 数")
+    parser.add_argument("-t", dest="max_samples", type=int, default=8, help="每个 IP 最多测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=300, help="并发连接数")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("--keep", type=float, default=0.5, help="每轮保留的比例")
+    parser.add_argument("--per-round", type=int, default=1, help="每轮每个 IP 的测试次数")
+    parser.add_argument("--timeout", type=float, default=1.0, help="单次连接超时秒数")
+    args = parser.parse_args()
+
+    raise_nofile_limit(args.concurrency)
+    ips = load_targets(args.file)
+
+    async def sample(ip):
+        return await tcp_connect(ip, args.port, args.timeout)
+
+    start = time.perf_counter()
+    results = asyncio.run(successive_elimination(
+        ips, sample, args.top_n, args.keep, args.per_round, args.max_samples, args.concurrency,
+    ))
+    ranked = [r for r in results if r["received"]]
+    write_result_csv(ranked, args.output)
+
+    fixed = len(ips) * args.max_samples
+    used = total_probes(results)
+    saved = 1 - used / fixed if fixed else 0
+    print(f"测试完成，用时 {time.perf_counter() - start:.2f}s，共 {used} 次测试"
+          f"（固定 {args.max_samples} 次需 {fixed} 次，节省 {saved:.0%}），已保存到 {args.output}")
+    for r in ranked[:args.top_n]:
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  平均延迟 {r['avg']:.2f} ms  测试 {r['sent']} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+一次生成多种格式的 IP 列表
+- 每个输出文件用一个 Output 声明：文件名、行模板、取前几行
+- 按排好的行顺序只遍历一遍，同时生成全部文件的内容
+- 先写临时文件再 rename，写到一半中断也不会留下残缺的文件
+- 内容与磁盘上的文件完全相同时不重写，工作流里不会再出现空提交
+
+内置模板见 TEMPLATES，也可以直接给出 str.format 模板，可用字段:
+    {ip} {port} {speed} {latency} {loss} {colo} {rank}（从 1 开始）{name}
+
+用法:
+    python emit.py -f result.csv -o yd.txt=ip -o valid_ipsyd.txt=rank --name xn --top 9
+    python emit.py -f HKG.csv -o ivv.txt=ip -o valid_ips.txt=speed
+    python emit.py -f result.csv -o sub.txt="{ip}:{port}#{colo}-{latency}ms" --top 20
+"""
+
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional
+
+from ranking import SCORE_ENV, score_from_env, select_top
+from results import LOSS_COLUMNS, ResultTable, load_results
+
+DEFAULT_PORT = 2087
+
+TEMPLATES = {
+    "ip": "{ip}",                                 # ivv.txt / yd.txt
+    "speed": "{ip}:{port}#↓{speed}",              # valid_ips.txt
+    "rank": "{ip}:{port}#{name}{rank}",           # valid_ipsyd.txt
+    "addr": "{ip}:{port}",
+    "colo": "{ip}:{port}#{colo}",                 # 订阅中常见的 地址:端口#备注
+    "colo-rank": "{ip}:{port}#{colo}-{name}{rank}",
+    "latency": "{ip}:{port}#{latency}ms",
+    "csv": "{ip},{port},{colo},{latency},{speed}",
+}
+
+
+class Output:
+    """
+    一个输出文件
+
+    Args:
+        path: 文件路径
+        template: TEMPLATES 中的名字或 str.format 模板
+        name: 模板中的 {name}（如地区名）
+        top: 只写前 top 行，None 为全部
+    """
+
+    def __init__(self, path: str, template: str = "ip", name: str = "", top: Optional[int] = None):
+        self.path = path
+        self.template = TEMPLATES.get(template, template)
+        self.name = name
+        self.top = top
+
+    @classmethod
+    def from_spec(cls, spec: str, name: str = "", top: Optional[int] = None) -> "Output":
+        """解析 "路径=模板"，省略模板时为 ip"""
+        path, _, template = spec.partition("=")
+        return cls(path, template or "ip", name, top)
+
+
+def write_if_changed(path: str, content: str) -> bool:
+    """
+    内容有变化时原子地写入文件
+
+    Returns:
+        是否写入了文件
+    """
+    data = content.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _field_columns(table: ResultTable, default_port: int) -> Dict[str, List]:
+    """模板字段对应的列，speed / latency / loss 与原来 pandas 输出的格式一致"""
+    n = len(table)
+
+    def values(name: Optional[str]) -> list:
+        return table.values(name) if name else [""] * n
+
+    return {
+        "ip": table.ips,
+        "port": table.ports(default_port),
+        "speed": values(table.speed_column),
+        "latency": values(table.latency_column),
+        "loss": values(table.find(LOSS_COLUMNS)),
+        "colo": table.column(table.colo_column) if table.colo_column else [""] * n,
+    }
+
+
+def emit(
+    table: ResultTable,
+    outputs: List[Output],
+    order: Optional[Iterable[int]] = None,
+    default_port: int = DEFAULT_PORT,
+) -> Dict[str, bool]:
+    """
+    按 order 的行顺序一次生成全部输出文件
+
+    Args:
+        table: results.load_results 读取的结果
+        outputs: 输出文件声明
+        order: 行号顺序（如 ranking.select_top 的结果），默认为文件中的顺序
+        default_port: 没有端口列时使用的端口
+
+    Returns:
+        {路径: 是否写入}，内容未变化的文件为 False
+    """
+    columns = _field_columns(table, default_port)
+    lines: List[List[str]] = [[] for _ in outputs]
+    limit = None if any(out.top is None for out in outputs) else max((out.top for out in outputs), default=0)
+    for rank, i in enumerate(range(len(table)) if order is None else order, 1):
+        if limit is not None and rank > limit:
+            break
+        row = {key: column[i] for key, column in columns.items()}
+        row["rank"] = rank
+        for out, out_lines in zip(outputs, lines):
+            if out.top is None or rank <= out.top:
+                out_lines.append(out.template.format(name=out.name, **row))
+
+    return {
+        out.path: write_if_changed(out.path, "".join(line + "\n" for line in out_lines))
+        for out, out_lines in zip(outputs, lines)
+    }
+
+
+def report(changed: Dict[str, bool]) -> None:
+    for path, written in changed.items():
+        print(f"✅ 已更新 {path}" if written else f"⏭️ 内容未变化，跳过 {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从测速结果一次生成多种格式的 IP 列表")
+    parser.add_argument("-f", dest="file", default="result.csv", help="测速结果文件")
+    parser.add_argument("-o", dest="outputs", action="append", required=True,
+                        help="输出，格式为 路径=模板，可重复；模板为 " + " / ".join(TEMPLATES) + " 或 str.format 模板")
+    parser.add_argument("-tp", dest="port", type=int, default=DEFAULT_PORT, help="结果中没有端口列时使用的端口")
+    parser.add_argument("--top", type=int, default=None, help=f"按综合评分（环境变量 {SCORE_ENV}）取前几个，默认按文件顺序输出全部")
+    parser.add_argument("--name", default="", help="模板中的 {name}")
+    args = parser.parse_args()
+
+    table = load_results(args.file)
+    order = None
+    if args.top is not None:
+        order = select_top(table, args.top, score_from_env())
+    outputs = [Output.from_spec(spec, args.name, args.top) for spec in args.outputs]
+    report(emit(table, outputs, order, args.port))
+
+
+if __name__ == "__main__":
+    main()
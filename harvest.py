@@ -0,0 +1,220 @@
+"""
+多来源 IP 采集
+- 并发抓取多个来源：HTML 表格页面、纯文本 IP 列表（ip.txt）、CIDR 列表（iphome.txt / yidong.txt）
+- 来源可以是 URL 或本地文件，每个来源有独立的超时，慢来源不会拖住其他来源
+- 合并去重，并记录每个 IP / CIDR 来自哪些来源
+
+环境变量:
+    HARVEST_SOURCES  每行一个来源，格式: <URL或文件路径> [超时秒数] [运营商]
+    HARVEST_OUTPUT   输出文件，默认 ip.txt
+    HARVEST_TIMEOUT  默认超时秒数，默认 15
+"""
+
+import asyncio
+import ipaddress
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ipset import parse_ips
+from webtable import TableParser, get_http_session, response_text
+
+ENTRY_PATTERN = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?$")
+DEFAULT_TIMEOUT = 15
+
+
+def parse_sources(spec: str, default_timeout: float = DEFAULT_TIMEOUT) -> List[dict]:
+    """
+    解析来源配置，每行一个来源: <URL或文件路径> [超时秒数] [运营商]
+
+    Args:
+        spec: 来源配置文本
+        default_timeout: 未指定超时时使用的秒数
+
+    Returns:
+        [{"url": ..., "timeout": ..., "carrier": ...}, ...]
+    """
+    sources = []
+    for line in spec.splitlines():
+        parts = line.split()
+        if not parts or parts[0].startswith("#"):
+            continue
+        sources.append({
+            "url": parts[0],
+            "timeout": float(parts[1]) if len(parts) > 1 else default_timeout,
+            "carrier": parts[2] if len(parts) > 2 else None,
+        })
+    return sources
+
+
+def normalize_entry(token: str) -> Optional[str]:
+    """校验并规范化单个 IP 或 CIDR，无效时返回 None"""
+    if not ENTRY_PATTERN.match(token):
+        return None
+    try:
+        if "/" in token:
+            return str(ipaddress.ip_network(token, strict=False))
+        return str(ipaddress.ip_address(token))
+    except ValueError:
+        return None
+
+
+def parse_entries(text: str, carrier: Optional[str] = None) -> List[str]:
+    """
+    从来源内容中提取 IP / CIDR
+
+    HTML 页面按 table.table-striped 表格解析（可按运营商过滤），
+    其他内容按纯文本列表解析，忽略 # 注释和无法识别的行
+
+    Args:
+        text: 来源内容
+        carrier: 只保留该运营商的行，仅对 HTML 表格生效
+
+    Returns:
+        按来源中出现顺序排列的 IP / CIDR 列表
+    """
+    if "<table" in text:
+        parser = TableParser()
+        parser.feed(text)
+        parser.close()
+        tokens = [ip for isp, ip, _ in parser.rows if carrier is None or isp == carrier]
+    else:
+        tokens = []
+        for line in text.splitlines():
+            tokens.extend(re.split(r"[\s,;]+", line.split("#", 1)[0].strip()))
+
+    entries = []
+    for token in tokens:
+        entry = normalize_entry(token)
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def fetch_source(source: dict) -> List[str]:
+    """读取单个来源并解析（阻塞调用，在守护线程中执行）"""
+    url = source["url"]
+    if url.startswith(("http://", "https://")):
+        resp = get_http_session().get(url, timeout=source["timeout"])
+        resp.raise_for_status()
+        text = response_text(resp)
+    else:
+        with open(url, encoding="utf-8") as f:
+            text = f.read()
+    return parse_entries(text, source.get("carrier"))
+
+
+def run_in_daemon_thread(func, *args) -> asyncio.Future:
+    """
+    在守护线程中执行阻塞调用，返回可等待的 Future
+
+    与线程池不同，超时后遗留的线程不会阻止事件循环和进程退出
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def worker():
+        try:
+            result, error = func(*args), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            pass  # 事件循环已关闭，结果已无人等待
+
+    threading.Thread(target=worker, daemon=True).start()
+    return future
+
+
+async def harvest_source(source: dict) -> Tuple[dict, List[str], Optional[str], float]:
+    """
+    在各自的截止时间内抓取一个来源
+
+    Returns:
+        (来源, 条目列表, 错误信息, 用时秒数)
+    """
+    start = time.perf_counter()
+    try:
+        entries = await asyncio.wait_for(run_in_daemon_thread(fetch_source, source), source["timeout"])
+        error = None
+    except asyncio.TimeoutError:
+        entries, error = [], f"超时 ({source['timeout']}s)"
+    except Exception as e:
+        entries, error = [], str(e)
+    return source, entries, error, time.perf_counter() - start
+
+
+async def harvest(sources: List[dict]) -> Dict[str, List[str]]:
+    """
+    并发抓取所有来源并合并去重
+
+    Args:
+        sources: parse_sources 返回的来源列表
+
+    Returns:
+        {IP或CIDR: [来源, ...]}，按首次出现顺序排列
+    """
+    candidates: Dict[str, List[str]] = {}
+    results = await asyncio.gather(*(harvest_source(source) for source in sources))
+
+    for source, entries, error, elapsed in results:
+        if error:
+            print(f"❌ {source['url']}: {error}，用时 {elapsed:.2f}s")
+            continue
+        print(f"✅ {source['url']}: {len(entries)} 条，用时 {elapsed:.2f}s")
+        for entry in entries:
+            candidates.setdefault(entry, [])
+            if source["url"] not in candidates[entry]:
+                candidates[entry].append(source["url"])
+    return candidates
+
+
+def write_candidates(candidates: Dict[str, List[str]], output: str) -> None:
+    """
+    写出候选列表：output 每行一个 IP / CIDR，output.sources 记录来源
+
+    Args:
+        candidates: harvest 的返回值
+        output: 输出文件路径
+    """
+    entries = list(candidates)
+    # 按起始地址的数值排序（IP 与 CIDR 混排），解析走 ipset 的向量化实现
+    order = np.argsort(parse_ips(entry.split("/", 1)[0] for entry in entries), kind="stable")
+    entries = [entries[i] for i in order]
+    with open(output, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(entry + "\n")
+    with open(output + ".sources", "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(f"{entry}\t{','.join(candidates[entry])}\n")
+
+
+def main():
+    default_timeout = float(os.environ.get("HARVEST_TIMEOUT", DEFAULT_TIMEOUT))
+    spec = os.environ.get("HARVEST_SOURCES") or "\n".join(sys.argv[1:]) or os.environ.get("TARGET_URL", "")
+    sources = parse_sources(spec, default_timeout)
+    if not sources:
+        raise ValueError("缺少来源：请设置 HARVEST_SOURCES 或在命令行传入 URL / 文件路径")
+
+    output = os.environ.get("HARVEST_OUTPUT", "ip.txt")
+    candidates = asyncio.run(harvest(sources))
+    write_candidates(candidates, output)
+    print(f"共合并 {len(candidates)} 个去重后的候选，已保存到 {output}")
+
+
+if __name__ == "__main__":
+    main()
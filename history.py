@@ -0,0 +1,241 @@
+"""
+测速历史记录（SQLite）
+- probes 表记录每次运行中每个 IP / 端口 / 运营商的测试结果（已发送、已接收、平均延迟）
+- scores 表按时间指数衰减地累计成功次数和延迟，写入时增量更新，查询不需要扫描历史
+- 探测前可据此跳过近期确认不可用的 IP、复用近期稳定 IP 的结果、把历史表现好的 IP 排在前面
+- compact 删除过期的原始记录和几乎衰减完的分数，文件大小保持有界
+"""
+
+import math
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ipset import parse_ips
+
+
+DEFAULT_PATH = "probe_history.db"
+DAY = 86400
+# 空闲页占文件页数的比例达到该值时 compact 才执行 VACUUM
+VACUUM_RATIO = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    ip INTEGER NOT NULL,
+    port INTEGER NOT NULL,
+    carrier TEXT NOT NULL,
+    ts REAL NOT NULL,
+    sent INTEGER NOT NULL,
+    received INTEGER NOT NULL,
+    avg_latency REAL
+);
+CREATE INDEX IF NOT EXISTS probes_ts ON probes (ts);
+CREATE TABLE IF NOT EXISTS scores (
+    ip INTEGER NOT NULL,
+    port INTEGER NOT NULL,
+    carrier TEXT NOT NULL,
+    weight REAL NOT NULL,
+    ok_weight REAL NOT NULL,
+    latency_sum REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (ip, port, carrier)
+) WITHOUT ROWID;
+"""
+
+# SQLite 单条语句的参数个数上限较低，批量查询时分块
+QUERY_CHUNK = 500
+
+
+class ProbeHistory:
+    """
+    测速历史与衰减分数
+
+    分数的含义（均按半衰期 half_life 指数衰减）:
+        weight      衰减后的测试次数，代表这份历史有多可信
+        success     衰减后的成功率
+        latency     衰减后的平均延迟（毫秒）
+        updated     最近一次测试的时间
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, half_life: float = 3 * DAY):
+        self.path = path
+        self.half_life = half_life
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _decay(self, elapsed: float) -> float:
+        return 0.5 ** (max(elapsed, 0.0) / self.half_life)
+
+    def _load(self, addrs: List[int], port: int, carrier: str) -> Dict[int, Tuple[float, float, float, float]]:
+        rows = {}
+        for i in range(0, len(addrs), QUERY_CHUNK):
+            chunk = addrs[i:i + QUERY_CHUNK]
+            query = (
+                "SELECT ip, weight, ok_weight, latency_sum, updated FROM scores "
+                f"WHERE port = ? AND carrier = ? AND ip IN ({','.join('?' * len(chunk))})"
+            )
+            for ip, *values in self.db.execute(query, [port, carrier, *chunk]):
+                rows[ip] = tuple(values)
+        return rows
+
+    def record(self, results: Iterable[Dict], port: int, carrier: str = "", ts: Optional[float] = None) -> None:
+        """
+        记录一次运行的测试结果并更新衰减分数
+
+        Args:
+            results: probe.summarize 格式的结果
+            port: 测试端口
+            carrier: 运营商，用于区分不同线路上的表现
+            ts: 测试时间，默认为当前时间
+        """
+        ts = time.time() if ts is None else ts
+        results = [r for r in results if r["sent"]]
+        if not results:
+            return
+        addrs = [int(a) for a in parse_ips(r["ip"] for r in results)]
+        existing = self._load(addrs, port, carrier)
+
+        probe_rows, score_rows = [], []
+        for addr, r in zip(addrs, results):
+            probe_rows.append((addr, port, carrier, ts, r["sent"], r["received"], r["avg"]))
+            weight, ok_weight, latency_sum, updated = existing.get(addr, (0.0, 0.0, 0.0, ts))
+            d = self._decay(ts - updated)
+            latency = r["avg"] * r["received"] if r["received"] else 0.0
+            score_rows.append((
+                addr, port, carrier,
+                weight * d + r["sent"], ok_weight * d + r["received"], latency_sum * d + latency, max(ts, updated),
+            ))
+
+        with self.db:
+            self.db.executemany("INSERT INTO probes VALUES (?, ?, ?, ?, ?, ?, ?)", probe_rows)
+            self.db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?)", score_rows)
+
+    def scores(self, ips: List[str], port: int, carrier: str = "", now: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        批量查询衰减分数，没有历史的 IP 不在返回结果中
+
+        Returns:
+            {ip: {"weight", "success", "latency", "updated"}}
+        """
+        now = time.time() if now is None else now
+        addrs = [int(a) for a in parse_ips(ips)]
+        by_addr = dict(zip(addrs, ips))
+        result = {}
+        for addr, (weight, ok_weight, latency_sum, updated) in self._load(addrs, port, carrier).items():
+            d = self._decay(now - updated)
+            result[by_addr[addr]] = {
+                "weight": weight * d,
+                "success": ok_weight / weight if weight else 0.0,
+                "latency": latency_sum / ok_weight if ok_weight else None,
+                "updated": updated,
+            }
+        return result
+
+    def score(self, ip: str, port: int, carrier: str = "", now: Optional[float] = None) -> Optional[Dict]:
+        return self.scores([ip], port, carrier, now).get(ip)
+
+    def plan(
+        self,
+        ips: List[str],
+        port: int,
+        carrier: str = "",
+        min_weight: float = 4.0,
+        dead_below: float = 0.05,
+        dead_retry: float = DAY,
+        stable_above: float = 0.99,
+        retest_interval: float = 6 * 3600,
+        now: Optional[float] = None,
+    ) -> Tuple[List[str], List[Dict], List[str]]:
+        """
+        根据历史决定本次要测试哪些 IP
+
+        - 不可用：成功率低于 dead_below 且距上次测试不足 dead_retry，跳过
+        - 稳定：成功率不低于 stable_above 且距上次测试不足 retest_interval，直接复用历史结果
+        - 其余需要测试，按历史表现排序：历史好的在前，没有历史的其次，历史差的在后
+        只有衰减后的测试次数不少于 min_weight 时才认为历史可信
+
+        Returns:
+            (需要测试的 IP, 复用的历史结果(probe.summarize 格式), 跳过的 IP)
+        """
+        now = time.time() if now is None else now
+        known = self.scores(ips, port, carrier, now)
+        to_probe, cached, skipped = [], [], []
+        for ip in dict.fromkeys(ips):
+            s = known.get(ip)
+            if s and s["weight"] >= min_weight:
+                age = now - s["updated"]
+                if s["success"] < dead_below and age < dead_retry:
+                    skipped.append(ip)
+                    continue
+                if s["success"] >= stable_above and age < retest_interval and s["latency"] is not None:
+                    sent = max(1, round(s["weight"]))
+                    received = round(sent * s["success"])
+                    cached.append({
+                        "ip": ip, "sent": sent, "received": received, "loss": 1 - received / sent,
+                        "avg": s["latency"], "samples": [], "cached": True,
+                    })
+                    continue
+            to_probe.append(ip)
+
+        def order(ip):
+            s = known.get(ip)
+            if not s or s["weight"] < min_weight:
+                return (1, 0.0)
+            return (0 if s["success"] >= 0.5 else 2, (1 - s["success"]) * 1000 + (s["latency"] or math.inf))
+
+        to_probe.sort(key=order)
+        return to_probe, cached, skipped
+
+    def compact(
+        self,
+        retention: float = 14 * DAY,
+        min_weight: float = 0.01,
+        now: Optional[float] = None,
+        vacuum_ratio: float = VACUUM_RATIO,
+    ) -> bool:
+        """
+        压缩历史：删除早于 retention 的原始记录，以及衰减后权重低于 min_weight 的分数
+
+        原始记录的信息已经累计在 scores 中，删除后不影响分数。
+        删除留下的空闲页会被之后的写入重用，只有空闲页占比达到 vacuum_ratio 时才 VACUUM 重写整个文件
+
+        Returns:
+            是否执行了 VACUUM
+        """
+        now = time.time() if now is None else now
+        # 权重衰减到 min_weight 以下所需的时间与初始权重有关，按每行的权重分别判断
+        cutoff = now - retention
+        with self.db:
+            self.db.execute("DELETE FROM probes WHERE ts < ?", (cutoff,))
+            stale = [
+                (ip, port, carrier)
+                for ip, port, carrier, weight, updated in self.db.execute(
+                    "SELECT ip, port, carrier, weight, updated FROM scores WHERE updated < ?", (cutoff,)
+                )
+                if weight * self._decay(now - updated) < min_weight
+            ]
+            self.db.executemany("DELETE FROM scores WHERE ip = ? AND port = ? AND carrier = ?", stale)
+        free = self.db.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = self.db.execute("PRAGMA page_count").fetchone()[0]
+        if pages and free / pages >= vacuum_ratio:
+            self.db.execute("VACUUM")
+            return True
+        return False
+
+    def recent(self, ip: str, port: int, carrier: str = "", limit: int = 20) -> List[Tuple[float, int, int, Optional[float]]]:
+        """某个 IP 最近的原始记录 [(时间, 已发送, 已接收, 平均延迟), ...]，新的在前"""
+        addr = int(parse_ips([ip])[0])
+        return self.db.execute(
+            "SELECT ts, sent, received, avg_latency FROM probes WHERE ip = ? AND port = ? AND carrier = ? "
+            "ORDER BY ts DESC LIMIT ?",
+            (addr, port, carrier, limit),
+        ).fetchall()
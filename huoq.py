@@ -1,19 +1,122 @@
+import hashlib
+import importlib.util
+import json
 import os
 import re
-from playwright.sync_api import sync_playwright
 import requests
 import time
 from datetime import datetime
 
-def get_telecom_ips():
-    url = os.environ.get("TARGET_URL")
-    if not url:
-        raise ValueError("缺少环境变量 TARGET_URL")
+from ipset import IPSet
+# 表格解析和 HTTP 快速通道不依赖 Playwright；Playwright 只在回退到浏览器时才导入
+from webtable import TableParser, fetch_table_rows_http, get_http_session, response_text, rows_from_json
 
-    ip_pattern = r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$"
+TABLE_ROW_SELECTOR = "table.table-striped tbody tr"
+# 上次抓取的来源指纹，用于判断来源是否有变化
+STATE_FILE = os.environ.get("HUOQ_STATE", ".huoq_state.json")
+# 各运营商候选 IP 的输出文件，一次抓取同时生成
+CARRIER_FILES = {"电信": "ip.txt", "移动": "yidong.txt", "联通": "liantong.txt"}
 
-    today_str = datetime.now().strftime("%Y/%m/%d")
-    telecom_ips = []
+# 在页面内一次性提取整张表格：[运营商, IP, 最后更新时间]，只需一次 IPC 往返
+EXTRACT_TABLE_JS = """
+(selector) => {
+    const rows = [];
+    for (const row of document.querySelectorAll(selector)) {
+        const cells = row.querySelectorAll("th, td");
+        if (cells.length < 3) continue;
+        const tds = row.querySelectorAll("td");
+        rows.push([
+            cells[1].innerText.trim(),
+            cells[2].innerText.trim(),
+            tds.length >= 8 ? tds[tds.length - 1].innerText.trim() : "",
+        ]);
+    }
+    return rows;
+}
+"""
+
+# 页面内判断表格中是否已出现今天的日期，配合 MutationObserver 轮询使用
+HAS_TODAY_JS = """
+([selector, today]) => {
+    for (const row of document.querySelectorAll(selector)) {
+        const tds = row.querySelectorAll("td");
+        if (tds.length >= 8 && tds[tds.length - 1].innerText.trim().startsWith(today)) {
+            return true;
+        }
+    }
+    return false;
+}
+"""
+
+
+class BrowserRequired(Exception):
+    """HTTP 快速通道拿不到今天的数据，需要 Playwright 渲染页面，但当前环境没有安装 Playwright"""
+
+
+def extract_table_rows(page, mode="bulk"):
+    """
+    提取表格中的 (运营商, IP, 最后更新时间) 行
+
+    Args:
+        page: Playwright 页面对象
+        mode: "bulk" 在页面内一次性提取；"cell" 为旧的逐行逐格读取方式
+
+    Returns:
+        [(isp, ip, last_update), ...]
+    """
+    if mode == "bulk":
+        return [tuple(row) for row in page.evaluate(EXTRACT_TABLE_JS, TABLE_ROW_SELECTOR)]
+
+    rows = []
+    for row in page.query_selector_all(TABLE_ROW_SELECTOR):
+        cells = row.query_selector_all("th, td")
+        if len(cells) < 3:
+            continue
+        tds = row.query_selector_all("td")
+        last_update = tds[-1].inner_text().strip() if len(tds) >= 8 else ""
+        rows.append((cells[1].inner_text().strip(), cells[2].inner_text().strip(), last_update))
+    return rows
+
+
+def wait_for_today(page, today_str, timeout=60, mode="bulk"):
+    """
+    等待表格中出现今天的日期
+
+    Args:
+        page: Playwright 页面对象
+        today_str: 今天的日期前缀，如 2025/08/29
+        timeout: 最长等待秒数
+        mode: "bulk" 使用页面内 MutationObserver 判断；"cell" 为旧的每秒轮询方式
+
+    Returns:
+        是否等到了今天的数据
+    """
+    if mode == "bulk":
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        try:
+            page.wait_for_function(
+                HAS_TODAY_JS,
+                arg=[TABLE_ROW_SELECTOR, today_str],
+                polling="mutation",
+                timeout=timeout * 1000,
+            )
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+    for _ in range(timeout):
+        for row in page.query_selector_all(TABLE_ROW_SELECTOR):
+            cells = row.query_selector_all("td")
+            if len(cells) >= 8 and cells[-1].inner_text().strip().startswith(today_str):
+                return True
+        time.sleep(1)
+    return False
+
+
+def fetch_table_rows_browser(url, today_str, mode="bulk"):
+    """用 Playwright 渲染页面后提取表格，适用于客户端渲染的页面"""
+    from playwright.sync_api import sync_playwright
 
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True, args=["--no-sandbox"])
@@ -21,52 +124,213 @@ def get_telecom_ips():
         page.goto(url, wait_until="domcontentloaded")
 
         # 最多等待 60 秒，直到表格中出现今天的日期
-        found_today = False
-        for _ in range(60):
-            rows = page.query_selector_all("table.table-striped tbody tr")
-            for row in rows:
-                cells = row.query_selector_all("td")
-                if len(cells) >= 8:
-                    last_update = cells[-1].inner_text().strip()
-                    if last_update.startswith(today_str):
-                        found_today = True
-                        break
-            if found_today:
-                break
-            time.sleep(1)
-
-        if not found_today:
+        if not wait_for_today(page, today_str, timeout=60, mode=mode):
             print("未能捕获到今天的数据，可能是接口未更新或反爬限制。")
-        
-        # 提取电信 IP
-        rows = page.query_selector_all("table.table-striped tbody tr")
-
-        print("抓取到的行数:", len(rows))
-
-        for row in rows:
-            if len(telecom_ips) >= 40:  # 已经收集够40个就退出
-                break
-            cells = row.query_selector_all("th, td")
-            if len(cells) >= 3:
-                isp = cells[1].inner_text().strip()
-                ip = cells[2].inner_text().strip()
-                print("调试行:", isp, ip)  # 调试用
-                if isp == "电信" and re.match(ip_pattern, ip):
-                #if re.match(ip_pattern, ip):
-                    telecom_ips.append(ip)
 
+        rows = extract_table_rows(page, mode)
         browser.close()
+    return rows
+
+
+def fetch_table_rows(url, today_str, mode="bulk", state=None):
+    """
+    获取表格行：优先走 HTTP 快速通道，表格为空或数据不是今天的才回退到 Playwright
+
+    Args:
+        url: 页面地址
+        today_str: 今天的日期前缀
+        mode: Playwright 提取方式，见 extract_table_rows
+        state: 上次运行保存的指纹，见 load_state；为 None 时不做增量判断
+
+    Returns:
+        (行列表, validators)；来源自上次以来没有变化时行列表为 None
+
+    Raises:
+        BrowserRequired: 需要回退到浏览器，但没有安装 Playwright
+    """
+    reason = "FAST_PATH=0"
+    # FAST_PATH=0 时跳过 HTTP 快速通道，直接使用浏览器
+    if os.environ.get("FAST_PATH", "1") != "0":
+        start = time.perf_counter()
+        try:
+            rows, source, validators = fetch_table_rows_http(url, validators=state)
+        except (requests.RequestException, ValueError) as e:
+            rows, source, validators = [], f"失败: {e}", {}
+        elapsed = time.perf_counter() - start
+
+        if rows is None or (state and rows and state.get("latest_update") == latest_update(rows) != ""):
+            # 304 或表格的最后更新时间与上次相同，无需再启动浏览器
+            print(f"⚡ 抓取路径: HTTP 快速通道 ({source})，来源未变化，用时 {elapsed:.2f}s")
+            return None, validators
+        if rows and any(last_update.startswith(today_str) for _, _, last_update in rows):
+            print(f"⚡ 抓取路径: HTTP 快速通道 ({source})，用时 {elapsed:.2f}s")
+            return rows, validators
+        reason = "数据不是今天的" if rows else f"未解析到表格 ({source})"
+        print(f"HTTP 快速通道不可用: {reason}，用时 {elapsed:.2f}s，回退到 Playwright")
+
+    if importlib.util.find_spec("playwright") is None:
+        raise BrowserRequired(reason)
+    start = time.perf_counter()
+    rows = fetch_table_rows_browser(url, today_str, mode)
+    print(f"🌐 抓取路径: Playwright，用时 {time.perf_counter() - start:.2f}s")
+    return rows, {}
+
+
+def latest_update(rows):
+    """表格中最新的“最后更新时间”（格式为 YYYY/MM/DD HH:MM:SS，可直接按字符串比较）"""
+    return max((last_update for _, _, last_update in rows), default="")
+
+
+def load_state(path=STATE_FILE):
+    """读取上次运行保存的来源指纹，不存在或损坏时返回空字典"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def write_github_output(**outputs):
+    """在 GitHub Actions 中写出 step outputs，供后续步骤通过 steps.<id>.outputs 判断"""
+    path = os.environ.get("GITHUB_OUTPUT")
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        for key, value in outputs.items():
+            f.write(f"{key}={value}\n")
+
+
+def is_valid_ip(ip):
+    """是否为有效的点分十进制 IPv4 地址（每段 0-255）"""
+    parts = ip.split(".")
+    return len(parts) == 4 and all(part.isascii() and part.isdigit() and len(part) <= 3 and int(part) <= 255 for part in parts)
+
+
+def parse_carrier_caps(spec, default_cap):
+    """
+    解析 CARRIER_CAPS，如 "电信=40,移动=60,联通=0"（0 表示不限制）
+
+    Args:
+        spec: 配置字符串，为空时对 CARRIER_FILES 中的全部运营商使用 default_cap
+        default_cap: 默认上限，None 表示不限制
+
+    Returns:
+        {运营商: 上限}，只包含需要输出的运营商
+    """
+    if not spec:
+        return {carrier: default_cap for carrier in CARRIER_FILES}
+    caps = {}
+    for item in re.split(r"[,;\s]+", spec.strip()):
+        carrier, _, cap = item.partition("=")
+        if carrier not in CARRIER_FILES:
+            raise ValueError(f"CARRIER_CAPS 中的运营商无效: {carrier}，可选: {', '.join(CARRIER_FILES)}")
+        caps[carrier] = int(cap) if cap else default_cap
+    return caps
+
+
+def harvest_ips(limit=40, incremental=False, carriers=None):
+    """
+    一次遍历表格，按运营商分别提取 IP 并写入 CARRIER_FILES 中对应的文件
+
+    incremental 为 True 时会读取并更新 STATE_FILE 中的来源指纹
+    （ETag / Last-Modified、表格最后更新时间、IP 集合哈希），
+    来源没有变化时不改写任何文件
+
+    Args:
+        limit: 每个运营商默认最多提取的 IP 数，None 表示不限制；可用 CARRIER_CAPS 单独配置
+        incremental: 是否启用增量判断
+        carriers: 只提取并写入这些运营商，None 表示 CARRIER_CAPS 中的全部运营商
+
+    Returns:
+        ({运营商: IP 列表}, 来源是否未变化)
+
+    Raises:
+        BrowserRequired: 见 fetch_table_rows
+    """
+    url = os.environ.get("TARGET_URL")
+    if not url:
+        raise ValueError("缺少环境变量 TARGET_URL")
+
+    # bulk: 页面内一次性提取（默认）；cell: 旧的逐格读取方式
+    mode = os.environ.get("EXTRACT_MODE", "bulk")
+    caps = parse_carrier_caps(os.environ.get("CARRIER_CAPS", ""), limit)
+    if carriers is not None:
+        unknown = [carrier for carrier in carriers if carrier not in CARRIER_FILES]
+        if unknown:
+            raise ValueError(f"运营商无效: {', '.join(unknown)}，可选: {', '.join(CARRIER_FILES)}")
+        caps = {carrier: caps.get(carrier, limit) for carrier in carriers}
+
+    today_str = datetime.now().strftime("%Y/%m/%d")
+    carrier_ips = {carrier: [] for carrier in caps}
+
+    state = load_state() if incremental else None
+    rows, validators = fetch_table_rows(url, today_str, mode, state)
+    if rows is None:
+        print("♻️ 来源自上次运行以来没有变化，跳过本次更新")
+        return state.get("ips", {}), True
+
+    print("抓取到的行数:", len(rows))
+
+    def is_full(carrier):
+        return bool(caps[carrier]) and len(carrier_ips[carrier]) >= caps[carrier]
+
+    for isp, ip, _ in rows:
+        if all(is_full(carrier) for carrier in caps):  # 所有运营商都已收集够就退出
+            break
+        print("调试行:", isp, ip)  # 调试用
+        # 每段都不超过 255 才收集，避免 999.1.1.1 之类的行让 IPSet.from_strings 报错、中断整次抓取
+        if isp in carrier_ips and not is_full(isp) and is_valid_ip(ip):
+            carrier_ips[isp].append(ip)
+
+    unique_ips = {carrier: IPSet.from_strings(ips).to_list() for carrier, ips in carrier_ips.items()}
+    ip_hash = hashlib.sha256(
+        "\n".join(f"{carrier}:{ip}" for carrier, ips in unique_ips.items() for ip in ips).encode()
+    ).hexdigest()
+
+    if incremental:
+        unchanged = bool(state) and state.get("ip_hash") == ip_hash and state.get("latest_update") == latest_update(rows)
+        save_state({
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+            "latest_update": latest_update(rows),
+            "ip_hash": ip_hash,
+            "ips": unique_ips,
+        })
+        if unchanged:
+            print("♻️ 提取到的 IP 集合与上次相同，跳过本次更新")
+            return unique_ips, True
+
+    for carrier, ips in unique_ips.items():
+        output = CARRIER_FILES[carrier]
+        with open(output, "w", encoding="utf-8") as f:
+            for ip in ips:
+                f.write(ip + "\n")
+
+        print(f"成功提取 {len(ips)} 个{carrier}IP地址，已保存到 {output}")
+        for ip in ips[:10]:
+            print(" -", ip)
 
-    unique_ips = sorted(set(telecom_ips))
-    with open("ip.txt", "w", encoding="utf-8") as f:
-        for ip in unique_ips:
-            f.write(ip + "\n")
+    return unique_ips, False
 
-    print(f"成功提取 {len(unique_ips)} 个电信IP地址，已保存到 ip.txt")
-    for ip in unique_ips[:10]:
-        print(" -", ip)
 
-    return unique_ips
+def get_telecom_ips(limit=40):
+    """只提取电信 IP（只写 ip.txt，不改动其他运营商的文件）"""
+    return harvest_ips(limit, carriers=["电信"])[0].get("电信", [])
 
 if __name__ == "__main__":
-    get_telecom_ips()
+    # 工作流只用到电信的 ip.txt，默认只写这一个文件，不覆盖手工维护的 yidong.txt；
+    # 需要其他运营商时设置 CARRIERS，如 "电信,移动"。INCREMENTAL=0 时强制全量更新
+    carriers = [c for c in re.split(r"[,;\s]+", os.environ.get("CARRIERS", "电信").strip()) if c]
+    try:
+        ips, unchanged = harvest_ips(incremental=os.environ.get("INCREMENTAL", "1") != "0", carriers=carriers)
+    except BrowserRequired as e:
+        # 工作流据此安装 Playwright 和 Chromium 后再运行一次；来源未变化或快速通道可用时不需要安装
+        print(f"🌐 需要浏览器（{e}），但未安装 Playwright，跳过本次提取")
+        write_github_output(needs_browser="true")
+    else:
+        write_github_output(unchanged=str(unchanged).lower())
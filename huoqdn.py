@@ -1,8 +1,12 @@
 import os
 import requests
-import pandas as pd
 from typing import List
 
+from ranking import score_from_env, select_top_file
+
+# 综合评分配置，格式见 ranking.py，默认只按平均延迟排序
+SCORE = score_from_env()
+
 def get_top_ips_from_csv(csv_file: str, top_n: int = 5) -> List[str]:
     """
     从CSV文件中获取延迟最低的top N个IP地址
@@ -15,24 +19,23 @@ def get_top_ips_from_csv(csv_file: str, top_n: int = 5) -> List[str]:
         IP地址列表
     """
     try:
-        # 读取CSV文件
-        df = pd.read_csv(csv_file)
+        # 读取CSV文件并按综合评分（默认为平均延迟）取前top_n个，同一IP只保留分数最好的一行
+        # 文件很大时分块读取，只保留入选的行
+        table, order = select_top_file(csv_file, top_n, SCORE)
         
         # 确保必要的列存在
         required_columns = ['IP 地址', '平均延迟']
         for col in required_columns:
-            if col not in df.columns:
+            if col not in table.columns:
                 raise ValueError(f"CSV文件中缺少必要的列: {col}")
         
-        # 按平均延迟排序，取前top_n个（延迟越低越好）
-        df_sorted = df.sort_values('平均延迟', ascending=True).head(top_n)
-        
         # 提取IP地址列表
-        ip_list = df_sorted['IP 地址'].tolist()
+        ip_list = [table.column('IP 地址')[i] for i in order]
         
         print(f"从 {csv_file} 中获取到前 {top_n} 个延迟最低的IP:")
+        latencies = table.numbers('平均延迟')
         for i, ip in enumerate(ip_list):
-            latency = df_sorted.iloc[i]['平均延迟']
+            latency = latencies[order[i]]
             print(f"  {i+1}. {ip} (延迟: {latency} ms)")
         
         return ip_list
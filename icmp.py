@@ -0,0 +1,216 @@
+"""
+ICMP 延迟 / 丢包测试（Linux 非特权 ICMP 数据报套接字）
+- 使用 socket(AF_INET, SOCK_DGRAM, IPPROTO_ICMP)，不需要 root，需要 net.ipv4.ping_group_range 包含当前用户组
+- 所有 IP 共用一个套接字，按 (IP, 序号) 匹配回包，可同时有数千个未完成的 echo 请求
+- 比 TCP 握手开销更小，适合先筛掉丢包和高延迟的候选
+- 没有权限创建 ICMP 套接字时自动退回 probe.py 的 TCP 连接测试
+
+用法:
+    python icmp.py -f ip.txt -t 8 -n 1000 -tlr 0 -o result.csv
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from probe import load_targets, probe_many, raise_nofile_limit, rank_results, summarize, write_result_csv
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+PAYLOAD = b"cfst-ping-probe!"
+
+
+def checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def icmp_available() -> bool:
+    """当前用户能否创建非特权 ICMP 套接字"""
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+        return True
+    except OSError:
+        return False
+
+
+class IcmpPinger:
+    """
+    共用一个 ICMP 数据报套接字的 ping
+
+    Linux 会把 echo 的标识符改写为套接字的本地“端口”，因此只用 (IP, 序号) 匹配回包；
+    序号为全局 16 位循环计数，只要超时时间内发出的请求少于 65536 个就不会混淆
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        # 大量回包同时到达时避免丢在接收缓冲区
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.ident = os.getpid() & 0xFFFF
+        self.seq = 0
+        self.pending: Dict[Tuple[str, int], Tuple[float, asyncio.Future]] = {}
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def close(self) -> None:
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_result(None)
+        self.pending.clear()
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                packet, (ip, _) = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            received = time.perf_counter()
+            # Linux 返回的数据不含 IP 头，其他系统（如 macOS）会带 IP 头
+            if packet and packet[0] >> 4 == 4 and len(packet) >= 20 + 8:
+                packet = packet[(packet[0] & 0x0F) * 4:]
+            if len(packet) < 8 or packet[0] != ICMP_ECHO_REPLY:
+                continue
+            seq = struct.unpack("!H", packet[6:8])[0]
+            entry = self.pending.pop((ip, seq), None)
+            if entry and not entry[1].done():
+                entry[1].set_result((received - entry[0]) * 1000)
+
+    async def ping(self, ip: str, timeout: float = 1.0) -> Optional[float]:
+        """
+        发送一次 echo 请求
+
+        Returns:
+            往返时间（毫秒），超时或发送失败返回 None
+        """
+        self.seq = (self.seq + 1) & 0xFFFF
+        seq = self.seq
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self.ident, seq)
+        packet = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum(header + PAYLOAD), self.ident, seq) + PAYLOAD
+
+        future = self.loop.create_future()
+        self.pending[(ip, seq)] = (time.perf_counter(), future)
+        try:
+            self.sock.sendto(packet, (ip, 0))
+            return await asyncio.wait_for(future, timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self.pending.pop((ip, seq), None)
+
+
+async def ping_ip(pinger: IcmpPinger, ip: str, samples: int, timeout: float, interval: float = 0.0) -> Dict:
+    """
+    对单个 IP 连续 ping samples 次
+
+    Returns:
+        probe.summarize 格式的结果
+    """
+    latencies = []
+    for i in range(samples):
+        if i and interval:
+            await asyncio.sleep(interval)
+        latencies.append(await pinger.ping(ip, timeout))
+    return summarize(ip, latencies)
+
+
+async def ping_many(
+    ips: Iterable[str],
+    samples: int = 4,
+    concurrency: int = 1000,
+    timeout: float = 1.0,
+    interval: float = 0.0,
+) -> List[Dict]:
+    """
+    并发 ping 一批 IP，同时未完成的 IP 不超过 concurrency 个，全部共用一个套接字
+
+    Args:
+        ips: 目标 IP
+        samples: 每个 IP 的 echo 次数
+        concurrency: 同时测试的 IP 数
+        timeout: 单次 echo 超时秒数
+        interval: 同一 IP 两次 echo 之间的间隔秒数
+
+    Returns:
+        probe.summarize 格式的结果列表，顺序与完成顺序一致
+    """
+    pinger = IcmpPinger()
+    targets: Iterator[str] = iter(ips)
+    results: List[Dict] = []
+
+    async def worker():
+        for ip in targets:
+            results.append(await ping_ip(pinger, ip, samples, timeout, interval))
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        pinger.close()
+    return results
+
+
+async def measure(
+    ips: List[str],
+    samples: int = 4,
+    concurrency: int = 1000,
+    timeout: float = 1.0,
+    fallback_port: int = 443,
+    fallback_concurrency: int = 300,
+) -> Tuple[str, List[Dict]]:
+    """
+    有 ICMP 权限时用 ping 测试，否则退回 TCP 连接测试
+
+    Returns:
+        (实际使用的方式 "icmp" / "tcp", 结果列表)
+    """
+    if icmp_available():
+        return "icmp", await ping_many(ips, samples, concurrency, timeout)
+    return "tcp", await probe_many(ips, fallback_port, samples, fallback_concurrency, timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ICMP 延迟 / 丢包测试，无权限时退回 TCP 连接测试")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-t", dest="samples", type=int, default=4, help="每个 IP 的测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=1000, help="同时测试的 IP 数")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="退回 TCP 测试时使用的端口")
+    parser.add_argument("-tl", dest="max_avg", type=float, default=None, help="平均延迟上限（毫秒）")
+    parser.add_argument("-tlr", dest="max_loss", type=float, default=1.0, help="丢包率上限（0-1）")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("-allip", dest="all_ips", action="store_true", help="测试 CIDR 内的全部 IP")
+    parser.add_argument("--timeout", type=float, default=1.0, help="单次测试超时秒数")
+    args = parser.parse_args()
+
+    ips = load_targets(args.file, args.all_ips)
+    if not icmp_available():
+        print("⚠️ 无法创建 ICMP 套接字（检查 net.ipv4.ping_group_range），改用 TCP 连接测试")
+        raise_nofile_limit(min(args.concurrency, 300))
+    print(f"开始延迟测试: {len(ips)} 个 IP，每个 IP {args.samples} 次")
+
+    start = time.perf_counter()
+    mode, results = asyncio.run(measure(
+        ips, args.samples, args.concurrency, args.timeout, args.port, min(args.concurrency, 300),
+    ))
+    ranked = rank_results(results, args.max_loss, args.max_avg)
+    write_result_csv(ranked, args.output)
+
+    elapsed = time.perf_counter() - start
+    print(f"测试完成（{mode}），用时 {elapsed:.2f}s，可用 {len(ranked)}/{len(results)} 个，已保存到 {args.output}")
+    for r in ranked[:10]:
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  平均延迟 {r['avg']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+紧凑的 IPv4 集合
+- IPSet 以排序去重后的 uint32 数组存储地址，每个 IP 只占 4 字节，按数值排序
+- 并集 / 交集 / 差集、CIDR 成员判断全部向量化
+- 二进制文件格式为 8 字节文件头 + 小端 uint32 数组，读取时直接内存映射，不做拷贝
+- 同时提供字符串 <-> uint32 的批量转换和 CIDR 区间工具，供 candidates.py 等模块共用
+"""
+
+import ipaddress
+from typing import Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+# 二进制文件头：魔数 + 版本号
+FILE_MAGIC = b"IPSET\x00\x00\x01"
+
+
+def parse_ips(ips: Iterable[str]) -> np.ndarray:
+    """
+    把点分十进制字符串批量转换为 uint32 数组（向量化解析，不逐个创建 ipaddress 对象）
+
+    Args:
+        ips: IP 字符串，允许首尾空白
+
+    Returns:
+        与输入顺序一致的 uint32 数组
+
+    Raises:
+        ValueError: 存在无效的 IPv4 地址
+    """
+    ips = [ip.strip() for ip in ips]
+    if not ips:
+        return np.empty(0, dtype=np.uint32)
+    try:
+        buf = np.frombuffer(("\n".join(ips) + "\n").encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        raise ValueError("存在无效的 IPv4 地址") from None
+
+    is_sep = (buf == ord(".")) | (buf == ord("\n"))
+    sep_pos = np.flatnonzero(is_sep)
+    digits = buf.astype(np.int64) - ord("0")
+    if len(sep_pos) != 4 * len(ips) or ((digits < 0) | (digits > 9))[~is_sep].any():
+        raise ValueError("存在无效的 IPv4 地址")
+    kinds = buf[sep_pos].reshape(-1, 4)
+    field_start = np.concatenate(([0], sep_pos[:-1] + 1))
+    lengths = sep_pos - field_start
+    if (kinds[:, :3] != ord(".")).any() or (lengths < 1).any() or (lengths > 3).any():
+        raise ValueError("存在无效的 IPv4 地址")
+
+    values = np.zeros(len(sep_pos), dtype=np.int64)
+    for k in range(3):
+        m = lengths > k
+        values[m] = values[m] * 10 + digits[field_start[m] + k]
+    if (values > 255).any():
+        raise ValueError("存在无效的 IPv4 地址")
+
+    octets = values.reshape(-1, 4)
+    return ((octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]).astype(np.uint32)
+
+
+def parse_ranges(lines: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    解析 IP / CIDR 行，合并成有序、不重叠的闭区间
+
+    Args:
+        lines: 文本行，忽略空行和 # 注释
+
+    Returns:
+        (起始地址数组, 结束地址数组)，均为 uint32，结束地址包含在区间内
+    """
+    starts, ends = [], []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            net = ipaddress.ip_network(line, strict=False)
+        except ValueError:
+            continue
+        if net.version != 4:
+            continue
+        starts.append(int(net.network_address))
+        ends.append(int(net.broadcast_address))
+    return merge_ranges(np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+
+def load_ranges(*paths: str) -> Tuple[np.ndarray, np.ndarray]:
+    """从一个或多个文件读取 CIDR 列表，见 parse_ranges"""
+    lines = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            lines.extend(f)
+    return parse_ranges(lines)
+
+
+def merge_ranges(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """合并重叠或相邻的区间"""
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint32)
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order].astype(np.int64), ends[order].astype(np.int64)
+    running_end = np.maximum.accumulate(ends)
+    # 当前区间的起点超过之前所有区间的终点 + 1 时，开始一个新区间
+    new_group = np.empty(len(starts), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = starts[1:] > running_end[:-1] + 1
+    group_starts = starts[new_group]
+    group_ends = np.maximum.reduceat(ends, np.flatnonzero(new_group))
+    return group_starts.astype(np.uint32), group_ends.astype(np.uint32)
+
+
+def in_ranges(addrs: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """判断每个地址是否落在 (starts, ends) 区间内，区间需已合并排序"""
+    if len(starts) == 0:
+        return np.zeros(len(addrs), dtype=bool)
+    idx = np.searchsorted(starts, addrs, side="right") - 1
+    hit = idx >= 0
+    hit[hit] = addrs[hit] <= ends[idx[hit]]
+    return hit
+
+
+
+
+# 0-255 每个八位组对应的 ASCII 数字，左对齐，不足 3 位用 0 字节填充
+_OCTET_DIGITS = np.zeros((256, 3), dtype=np.uint8)
+for _value in range(256):
+    _digits = str(_value).encode()
+    _OCTET_DIGITS[_value, :len(_digits)] = np.frombuffer(_digits, dtype=np.uint8)
+
+
+def format_ips(addrs: np.ndarray) -> bytes:
+    """
+    把 uint32 地址数组格式化为 "a.b.c.d\\n" 拼接的字节串（全部向量化）
+
+    每个地址先写入固定 16 字节的槽位，再去掉填充用的 0 字节
+    """
+    addrs = np.asarray(addrs, dtype=np.uint32)
+    out = np.zeros((len(addrs), 16), dtype=np.uint8)
+    for i, shift in enumerate((24, 16, 8, 0)):
+        out[:, i * 4:i * 4 + 3] = _OCTET_DIGITS[(addrs >> shift) & 255]
+        out[:, i * 4 + 3] = ord(".") if i < 3 else ord("\n")
+    return out[out != 0].tobytes()
+
+
+def ips_to_strings(addrs: np.ndarray) -> List[str]:
+    """uint32 数组转换为点分十进制字符串列表"""
+    if len(addrs) == 0:
+        return []
+    return format_ips(addrs).decode("ascii").split("\n")[:-1]
+
+
+class IPSet:
+    """
+    排序去重的 IPv4 地址集合，底层为 uint32 数组
+
+    用法:
+        a = IPSet.from_strings(["1.1.1.1", "1.0.0.1"])
+        b = IPSet.load("ips.bin")
+        (a | b).within(["1.0.0.0/8"]).to_list()
+    """
+
+    def __init__(self, addrs: Union[np.ndarray, Iterable[int]] = (), _sorted: bool = False):
+        addrs = np.asarray(addrs, dtype=np.uint32) if not isinstance(addrs, np.ndarray) else addrs
+        self.addrs = addrs if _sorted else np.unique(addrs.astype(np.uint32, copy=False))
+
+    @classmethod
+    def from_strings(cls, ips: Iterable[str]) -> "IPSet":
+        return cls(parse_ips(ips))
+
+    @classmethod
+    def from_file(cls, path: str) -> "IPSet":
+        """从文本文件读取，每行一个 IP，忽略空行和 # 注释"""
+        with open(path, encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+        return cls.from_strings(line for line in lines if line)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IPSet":
+        """
+        读取 save 写出的二进制文件
+
+        Args:
+            path: 文件路径
+            mmap: 为 True 时直接内存映射文件（只读、零拷贝），否则读入内存
+        """
+        with open(path, "rb") as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"不是有效的 IPSet 文件: {path}")
+        if mmap:
+            addrs = np.memmap(path, dtype="<u4", mode="r", offset=len(FILE_MAGIC))
+        else:
+            addrs = np.fromfile(path, dtype="<u4", offset=len(FILE_MAGIC))
+        return cls(addrs, _sorted=True)
+
+    def save(self, path: str) -> None:
+        """写出为 8 字节文件头 + 小端 uint32 数组"""
+        with open(path, "wb") as f:
+            f.write(FILE_MAGIC)
+            self.addrs.astype("<u4", copy=False).tofile(f)
+
+    def __len__(self) -> int:
+        return len(self.addrs)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_list())
+
+    def __contains__(self, ip: Union[str, int]) -> bool:
+        value = int(ipaddress.IPv4Address(ip)) if isinstance(ip, str) else int(ip)
+        idx = np.searchsorted(self.addrs, value)
+        return bool(idx < len(self.addrs) and self.addrs[idx] == value)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, IPSet) and np.array_equal(self.addrs, other.addrs)
+
+    def __repr__(self) -> str:
+        return f"IPSet({len(self)} 个地址)"
+
+    def union(self, other: "IPSet") -> "IPSet":
+        return IPSet(np.union1d(self.addrs, other.addrs), _sorted=True)
+
+    def intersection(self, other: "IPSet") -> "IPSet":
+        return IPSet(np.intersect1d(self.addrs, other.addrs, assume_unique=True), _sorted=True)
+
+    def difference(self, other: "IPSet") -> "IPSet":
+        return IPSet(np.setdiff1d(self.addrs, other.addrs, assume_unique=True), _sorted=True)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def contains_many(self, addrs: np.ndarray) -> np.ndarray:
+        """批量判断 uint32 地址是否在集合中"""
+        addrs = np.asarray(addrs, dtype=np.uint32)
+        idx = np.searchsorted(self.addrs, addrs)
+        hit = idx < len(self.addrs)
+        hit[hit] = self.addrs[idx[hit]] == addrs[hit]
+        return hit
+
+    def in_cidrs(self, cidrs: Iterable[str]) -> np.ndarray:
+        """集合中每个地址是否属于给定的任一 CIDR"""
+        return in_ranges(self.addrs, *parse_ranges(cidrs))
+
+    def within(self, cidrs: Iterable[str]) -> "IPSet":
+        """只保留属于给定 CIDR 的地址"""
+        return IPSet(self.addrs[self.in_cidrs(cidrs)], _sorted=True)
+
+    def outside(self, cidrs: Iterable[str]) -> "IPSet":
+        """去掉属于给定 CIDR 的地址"""
+        return IPSet(self.addrs[~self.in_cidrs(cidrs)], _sorted=True)
+
+    def to_list(self) -> List[str]:
+        """按数值顺序返回 IP 字符串列表"""
+        return ips_to_strings(self.addrs)
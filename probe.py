@@ -0,0 +1,547 @@
+"""
+TCP 连接延迟测试，可替代 CloudflareST 的延迟测速阶段
+- asyncio 非阻塞 socket，单核即可维持数千个并发连接
+- 每个 IP 测试多次，统计已发送 / 已接收 / 丢包率 / 平均延迟
+- 目标很多时可按 --workers 分片到多个进程，每个进程一个事件循环，结果分批经管道传回后合并
+- 设置 --want 时按 colo.py 的 /24 数据中心索引，在测试之前只保留想要的数据中心的目标
+- 输出与 CloudflareST 相同表头的 result.csv，huoqdn.py / xn.py 可直接读取
+
+用法（参数与 CloudflareST 保持一致）:
+    python probe.py -f ip.txt -t 8 -n 300 -tp 2087 -tlr 0 -o result.csv
+    python probe.py -f ip.txt -tp 2087 --want HKG,NRT --colo-index colo_index.npz
+"""
+
+import argparse
+import asyncio
+import csv
+import multiprocessing
+import socket
+import time
+from multiprocessing.connection import wait
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from candidates import expand_all, sample_per_24
+from history import ProbeHistory
+from ipset import ips_to_strings, parse_ips, parse_ranges
+from stats import STAT_FIELDS, SampleMatrix, attach_stats
+
+# CloudflareST 的 result.csv 表头
+RESULT_HEADER = ["IP 地址", "已发送", "已接收", "丢包率", "平均延迟", "下载速度(MB/s)", "地区码"]
+# 自适应测试追加的列
+CONFIDENCE_COLUMN = "置信度"
+# 多端口测试追加的列，为该 IP 表现最好的端口
+PORT_COLUMN = "端口"
+# 追加在 CloudflareST 表头之后的可选列: (结果字段, 表头, 写出格式, 读取类型)
+# 任一结果带有该字段时才输出这一列，值为 None 时留空
+EXTRA_COLUMNS = [
+    ("confidence", CONFIDENCE_COLUMN, "{:.3f}", float),
+    ("port", PORT_COLUMN, "{}", int),
+    ("tls_handshake", "TLS握手(ms)", "{:.2f}", float),
+    ("tls_resumed", "复用握手(ms)", "{:.2f}", float),
+    ("ttfb", "首字节(ms)", "{:.2f}", float),
+    ("median", "中位数(ms)", "{:.2f}", float),
+    ("p90", "P90(ms)", "{:.2f}", float),
+    ("p99", "P99(ms)", "{:.2f}", float),
+    ("jitter", "抖动(ms)", "{:.2f}", float),
+]
+# Cloudflare 代理支持的 HTTPS 端口
+CF_HTTPS_PORTS = [443, 2053, 2083, 2087, 2096, 8443]
+
+
+def load_targets(
+    path: str,
+    all_ips: bool = False,
+    seed: Optional[int] = None,
+    colo_filter: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+) -> List[str]:
+    """
+    读取测速目标，单个 IP 原样保留，CIDR 与 CloudflareST 一样每个 /24 随机取一个 IP
+
+    Args:
+        path: 目标文件，每行一个 IP 或 CIDR
+        all_ips: 为 True 时展开 CIDR 内的全部地址（对应 CloudflareST 的 -allip）
+        seed: CIDR 抽样的随机种子
+        colo_filter: 按数据中心过滤 uint32 地址数组，返回保留的地址（如 colo.ColoIndex.filter）；
+            CIDR 的地址在转换为字符串之前过滤
+
+    Returns:
+        IP 字符串列表
+    """
+    ips, cidrs = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                (cidrs if "/" in line else ips).append(line)
+
+    if colo_filter is not None and ips:
+        addrs = parse_ips(ips)
+        keep = np.isin(addrs, colo_filter(addrs))
+        ips = [ip for ip, k in zip(ips, keep.tolist()) if k]
+    if cidrs:
+        starts, ends = parse_ranges(cidrs)
+        chunks = expand_all(starts, ends) if all_ips else sample_per_24(starts, ends, 1, seed=seed)
+        for addrs in chunks:
+            if colo_filter is not None:
+                addrs = colo_filter(addrs)
+            ips.extend(ips_to_strings(addrs))
+    return list(dict.fromkeys(ips))
+
+
+async def tcp_connect(ip: str, port: int, timeout: float) -> Optional[float]:
+    """
+    测量一次 TCP 三次握手耗时
+
+    Returns:
+        连接耗时（毫秒），失败或超时返回 None
+    """
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        start = time.perf_counter()
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        return (time.perf_counter() - start) * 1000
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        sock.close()
+
+
+async def probe_ip(
+    ip: str,
+    port: int,
+    samples: int,
+    timeout: float,
+    matrix: Optional[SampleMatrix] = None,
+    row: Optional[int] = None,
+) -> Dict:
+    """
+    对单个 IP 连续测试 samples 次
+
+    给出 matrix 时样本写入矩阵的第 row 行，结果中以 "row" 代替 "samples"
+
+    Returns:
+        {"ip", "sent", "received", "loss", "avg", "samples"}，samples 中失败的测试记为 None
+    """
+    latencies = [await tcp_connect(ip, port, timeout) for _ in range(samples)]
+    if matrix is None:
+        return summarize(ip, latencies)
+    matrix.set_row(row, latencies)
+    result = summarize(ip, latencies, keep_samples=False)
+    result["row"] = row
+    return result
+
+
+def summarize(ip: str, latencies: List[Optional[float]], keep_samples: bool = True) -> Dict:
+    """
+    汇总一个 IP 的测试结果
+
+    Args:
+        ip: IP 地址
+        latencies: 每次测试的延迟（毫秒），失败记为 None
+        keep_samples: 是否在结果中保留样本列表（样本已写入 SampleMatrix 时不保留）
+
+    Returns:
+        {"ip", "sent", "received", "loss", "avg", "samples"}
+    """
+    ok = [ms for ms in latencies if ms is not None]
+    result = {
+        "ip": ip,
+        "sent": len(latencies),
+        "received": len(ok),
+        "loss": 1 - len(ok) / len(latencies) if latencies else 1.0,
+        "avg": sum(ok) / len(ok) if ok else None,
+    }
+    if keep_samples:
+        result["samples"] = latencies
+    return result
+
+
+async def probe_many(
+    ips: Iterable[str],
+    port: int,
+    samples: int = 4,
+    concurrency: int = 300,
+    timeout: float = 1.0,
+    matrix: Optional[SampleMatrix] = None,
+) -> List[Dict]:
+    """
+    并发测试一批 IP，同时进行的连接数不超过 concurrency
+
+    固定数量的 worker 从同一个迭代器中取 IP，不会为每个 IP 创建任务，适合数十万规模的目标
+
+    Args:
+        ips: 目标 IP
+        port: 目标端口
+        samples: 每个 IP 的测试次数（对应 CloudflareST 的 -t）
+        concurrency: 并发连接数（对应 CloudflareST 的 -n）
+        timeout: 单次连接超时秒数
+        matrix: 预分配的样本矩阵（至少 len(ips) 行），第 i 个 IP 的样本写入第 i 行
+
+    Returns:
+        probe_ip 的结果列表，顺序与完成顺序一致
+    """
+    targets: Iterator = iter(enumerate(ips))
+    results: List[Dict] = []
+
+    async def worker():
+        for row, ip in targets:
+            results.append(await probe_ip(ip, port, samples, timeout, matrix, row))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def iter_probe(
+    ips: Iterable[str],
+    port: int,
+    samples: int = 4,
+    concurrency: int = 300,
+    timeout: float = 1.0,
+) -> AsyncIterator[Dict]:
+    """
+    与 probe_many 相同，但每测完一个 IP 就产出结果
+
+    调用方提前结束迭代（break 或关闭生成器）时，未完成的测试会被取消
+    """
+    targets: Iterator[str] = iter(ips)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        for ip in targets:
+            queue.put_nowait(await probe_ip(ip, port, samples, timeout))
+
+    async def run_all():
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            queue.put_nowait(None)
+
+    runner = asyncio.ensure_future(run_all())
+    try:
+        while True:
+            result = await queue.get()
+            if result is None:
+                break
+            yield result
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+
+
+def install_uvloop() -> bool:
+    """有 uvloop 时将其设为事件循环实现，返回是否成功"""
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def _shard_worker(ips: List[str], port: int, samples: int, concurrency: int, timeout: float,
+                  conn, batch_size: int, use_uvloop: bool) -> None:
+    """
+    子进程：在自己的事件循环中测试一个分片，每 batch_size 个结果经管道发回一次，
+    正常结束时最后发送 None，出错时发送 ("error", 异常描述)
+    """
+    if use_uvloop:
+        install_uvloop()
+
+    async def run():
+        targets = iter(ips)
+        batch: List[Dict] = []
+
+        async def worker():
+            for ip in targets:
+                batch.append(await probe_ip(ip, port, samples, timeout))
+                if len(batch) >= batch_size:
+                    conn.send(batch[:])
+                    batch.clear()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        if batch:
+            conn.send(batch)
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        conn.send(("error", repr(e)))
+    else:
+        conn.send(None)
+    finally:
+        conn.close()
+
+
+def iter_probe_sharded(
+    ips: List[str],
+    port: int,
+    samples: int = 4,
+    concurrency: int = 300,
+    timeout: float = 1.0,
+    workers: int = 2,
+    use_uvloop: bool = False,
+    batch_size: int = 256,
+) -> Iterator[Dict]:
+    """
+    多进程分片测试，边测边返回结果
+
+    目标按轮转方式分到 workers 个进程（相邻 /24 分散到不同进程），
+    总并发数 concurrency 平均分给各进程；每个进程一个事件循环，可选 uvloop
+
+    Args:
+        ips: 目标 IP
+        port: 目标端口
+        samples: 每个 IP 的测试次数
+        concurrency: 所有进程合计的并发连接数
+        timeout: 单次连接超时秒数
+        workers: 进程数
+        use_uvloop: 子进程是否使用 uvloop（未安装时忽略）
+        batch_size: 子进程每次发回的结果数
+
+    Yields:
+        probe_ip 的结果，顺序与各进程的完成顺序一致
+
+    Raises:
+        RuntimeError: 某个分片进程出错或意外退出，该分片未发回的 IP 没有结果
+    """
+    workers = max(1, min(workers, len(ips)))
+    per_worker = max(1, -(-concurrency // workers))
+    conns, procs = [], []
+    for i in range(workers):
+        recv, send = multiprocessing.Pipe(duplex=False)
+        proc = multiprocessing.Process(
+            target=_shard_worker,
+            args=(ips[i::workers], port, samples, per_worker, timeout, send, batch_size, use_uvloop),
+            daemon=True,
+        )
+        proc.start()
+        send.close()
+        conns.append(recv)
+        procs.append(proc)
+
+    try:
+        while conns:
+            for conn in wait(conns):
+                try:
+                    batch = conn.recv()
+                except EOFError:
+                    # 没有收到结束标记就断开：子进程被杀死（如内存不足）
+                    raise RuntimeError("分片进程意外退出") from None
+                if batch is None:
+                    conns.remove(conn)
+                    conn.close()
+                    continue
+                if isinstance(batch, tuple):
+                    raise RuntimeError(f"分片进程出错: {batch[1]}")
+                yield from batch
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+
+
+def probe_sharded(ips: List[str], port: int, samples: int = 4, concurrency: int = 300, timeout: float = 1.0,
+                  workers: int = 2, use_uvloop: bool = False) -> List[Dict]:
+    """iter_probe_sharded 的全部结果"""
+    return list(iter_probe_sharded(ips, port, samples, concurrency, timeout, workers, use_uvloop))
+
+
+async def probe_many_ports(
+    ips: Iterable[str],
+    ports: List[int],
+    samples: int = 4,
+    concurrency: int = 300,
+    timeout: float = 1.0,
+) -> List[Dict]:
+    """
+    一次测试每个 IP 的多个端口，所有 (IP, 端口) 共用 concurrency 个连接
+
+    Args:
+        ips: 目标 IP
+        ports: 要测试的端口
+        samples: 每个 (IP, 端口) 的测试次数
+        concurrency: 并发连接数
+        timeout: 单次连接超时秒数
+
+    Returns:
+        每个 IP 一个结果：最好的端口（丢包率、平均延迟最低）的 probe_ip 结果，
+        额外带 "port" 和 "ports"（{端口: probe_ip 结果}）
+    """
+    jobs = ((ip, port) for ip in ips for port in ports)
+    by_ip: Dict[str, Dict[int, Dict]] = {}
+
+    async def worker():
+        for ip, port in jobs:
+            by_ip.setdefault(ip, {})[port] = await probe_ip(ip, port, samples, timeout)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    results = []
+    for ip, per_port in by_ip.items():
+        port, best = min(per_port.items(), key=lambda item: port_rank_key(item[1]))
+        results.append(dict(best, port=port, ports=per_port))
+    return results
+
+
+def port_rank_key(result: Dict):
+    return result["loss"], result["avg"] if result["avg"] is not None else float("inf")
+
+
+def parse_ports(spec: str) -> List[int]:
+    """解析 "443,2053,2087" 形式的端口列表，"cf" 表示 Cloudflare 的全部 HTTPS 端口"""
+    if spec.strip().lower() == "cf":
+        return list(CF_HTTPS_PORTS)
+    return list(dict.fromkeys(int(p) for p in spec.split(",") if p.strip()))
+
+
+def rank_results(
+    results: List[Dict],
+    max_loss: float = 1.0,
+    max_avg: Optional[float] = None,
+    by: str = "avg",
+) -> List[Dict]:
+    """
+    过滤并排序：去掉全部丢包、丢包率超过 max_loss、平均延迟超过 max_avg 的 IP，
+    按丢包率、by 字段升序排列（默认平均延迟，与 CloudflareST 一致；
+    也可以是 stats.attach_stats 补上的 median / p90 / p99 / jitter，
+    没有该字段的结果（如历史记录复用的结果）按平均延迟排序）
+    """
+    kept = [
+        r for r in results
+        if r["received"] and r["loss"] <= max_loss and (max_avg is None or r["avg"] <= max_avg)
+    ]
+    return sorted(kept, key=lambda r: (r["loss"], r["avg"] if r.get(by) is None else r[by]))
+
+
+def write_result_csv(results: List[Dict], path: str = "result.csv") -> None:
+    """
+    按 CloudflareST 的格式写出 result.csv，下载速度和地区码未测试时分别为 0.00 和空
+
+    结果带有 EXTRA_COLUMNS 中的字段（如 adaptive.py 的置信度、多端口测试的端口、tls.py 的握手耗时）时
+    在最后追加对应的列，前 7 列保持不变
+    """
+    extras = [col for col in EXTRA_COLUMNS if any(col[0] in r for r in results)]
+    header = RESULT_HEADER + [name for _, name, _, _ in extras]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for r in results:
+            row = [
+                r["ip"],
+                r["sent"],
+                r["received"],
+                f"{r['loss']:.2f}",
+                f"{r['avg']:.2f}",
+                f"{r.get('speed', 0):.2f}",
+                r.get("colo", ""),
+            ]
+            for key, _, fmt, _ in extras:
+                value = r.get(key)
+                row.append("" if value is None else fmt.format(value))
+            writer.writerow(row)
+
+
+def raise_nofile_limit(needed: int) -> None:
+    """并发连接数较大时把文件描述符软上限提高到硬上限"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < needed + 64:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP 连接延迟测试（CloudflareST 兼容参数）")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-t", dest="samples", type=int, default=4, help="每个 IP 的测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=300, help="并发连接数")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="测试端口")
+    parser.add_argument("--ports", default=None, help="同时测试多个端口，如 443,2053,2087,8443（cf 表示全部 HTTPS 端口），输出每个 IP 最好的端口")
+    parser.add_argument("-tl", dest="max_avg", type=float, default=None, help="平均延迟上限（毫秒）")
+    parser.add_argument("-tlr", dest="max_loss", type=float, default=1.0, help="丢包率上限（0-1）")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("-allip", dest="all_ips", action="store_true", help="测试 CIDR 内的全部 IP")
+    parser.add_argument("--timeout", type=float, default=1.0, help="单次连接超时秒数")
+    parser.add_argument("--stats", action="store_true", help="输出中位数、P90、P99、抖动列")
+    parser.add_argument("--rank-by", choices=["avg"] + STAT_FIELDS, default="avg", help="丢包率相同时的排序依据，非 avg 时自动启用 --stats")
+    parser.add_argument("--workers", type=int, default=1, help="测试进程数，大于 1 时按进程分片")
+    parser.add_argument("--uvloop", action="store_true", help="使用 uvloop 事件循环（需要安装 uvloop）")
+    parser.add_argument("--history", default=None, help="测速历史数据库，设置后跳过近期不可用的 IP、复用近期稳定 IP 的结果")
+    parser.add_argument("--carrier", default="", help="运营商，历史记录按运营商区分")
+    parser.add_argument("--retest", type=float, default=6, help="稳定 IP 的最短重测间隔（小时）")
+    parser.add_argument("--want", default="", help="只测试这些数据中心的 IP，逗号分隔，如 HKG,NRT（按 --colo-index 过滤）")
+    parser.add_argument("--colo-index", default="colo_index.npz", help="colo.py 生成的数据中心索引")
+    parser.add_argument("--keep-unknown", action="store_true", help="按数据中心过滤时保留索引中没有记录的 IP")
+    args = parser.parse_args()
+
+    raise_nofile_limit(args.concurrency)
+    colo_filter = None
+    wanted = [w.strip().upper() for w in args.want.split(",") if w.strip()]
+    if wanted:
+        from colo import ColoIndex  # colo.py 导入了 probe，在这里导入以免循环导入
+
+        index = ColoIndex.load(args.colo_index)
+        print(f"🌍 只测试数据中心 {','.join(wanted)} 的 IP（索引 {args.colo_index}，{len(index)} 个 /{index.prefix}）")
+
+        def colo_filter(addrs):
+            return index.filter(addrs, wanted, args.keep_unknown)
+
+    ips = load_targets(args.file, args.all_ips, colo_filter=colo_filter)
+    ports = parse_ports(args.ports) if args.ports else [args.port]
+    cached: List[Dict] = []
+    history = None
+    if args.history:
+        history = ProbeHistory(args.history)
+        # 历史按端口分别记录，多端口测试时只记录不筛选
+        if len(ports) == 1:
+            ips, cached, skipped = history.plan(ips, args.port, args.carrier, retest_interval=args.retest * 3600)
+            print(f"📚 历史记录: 跳过不可用 {len(skipped)} 个，复用稳定 {len(cached)} 个")
+    print(f"开始延迟测试: {len(ips)} 个 IP，端口 {','.join(map(str, ports))}，每个 IP {args.samples} 次，"
+          f"并发 {args.concurrency}，进程 {args.workers}")
+
+    want_stats = args.stats or args.rank_by != "avg"
+    # 单端口、单进程时样本直接写入预分配的矩阵；多端口和分片的结果带样本列表，统计时再排成矩阵
+    matrix = SampleMatrix(len(ips), args.samples) if want_stats and len(ports) == 1 and args.workers <= 1 else None
+
+    start = time.perf_counter()
+    if args.uvloop and args.workers <= 1 and not install_uvloop():
+        print("⚠️ 未安装 uvloop，使用默认事件循环")
+    if len(ports) > 1:
+        results = asyncio.run(probe_many_ports(ips, ports, args.samples, args.concurrency, args.timeout))
+    elif args.workers > 1:
+        results = probe_sharded(ips, args.port, args.samples, args.concurrency, args.timeout, args.workers, args.uvloop)
+    else:
+        results = asyncio.run(probe_many(ips, args.port, args.samples, args.concurrency, args.timeout, matrix))
+    if history:
+        if len(ports) > 1:
+            for port in ports:
+                history.record([r["ports"][port] for r in results if port in r["ports"]], port, args.carrier)
+        else:
+            history.record(results, args.port, args.carrier)
+        history.compact()
+        history.close()
+    if want_stats:
+        attach_stats(results, matrix=matrix)
+    # 历史记录复用的结果没有样本，不计算统计量，排序时按平均延迟
+    results += cached
+    ranked = rank_results(
+        [r for r in results if r.get("cached") or r.get(args.rank_by) is not None], args.max_loss, args.max_avg, args.rank_by,
+    )
+    write_result_csv(ranked, args.output)
+
+    elapsed = time.perf_counter() - start
+    print(f"测试完成，用时 {elapsed:.2f}s，可用 {len(ranked)}/{len(results)} 个，已保存到 {args.output}")
+    for r in ranked[:10]:
+        port = f"  端口 {r['port']}" if "port" in r else ""
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  平均延迟 {r['avg']:.2f} ms{port}")
+
+
+if __name__ == "__main__":
+    main()
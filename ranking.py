@@ -0,0 +1,348 @@
+"""
+前 N 名选择与综合评分，yd.py / huoqdn.py 共用
+- 综合分数 = 延迟 × 权重 + 丢包率 × 权重 − 下载速度 × 权重 + 数据中心加减分，越小越好
+- 同分时依次比较丢包率、延迟、下载速度（高者优先）、原始行号
+- 用堆选出前 N 个（O(n log N)），只对分界以内的少数行排序；同一 IP 只保留分数最好的一行
+- 数百万行的数组可用 select_top_array（numpy.partition，O(n)）
+- 很大的结果文件用 stream_select 分块读取，按分组（运营商 / 数据中心 / 端口）各保留前 N 名，内存与文件大小无关
+
+评分配置可通过环境变量 RANK_SCORE 指定，例如:
+    RANK_SCORE="latency=1,loss=1000,speed=2,colo=HKG:-30|NRT:-10,other=20"
+表示每毫秒延迟 1 分、丢包率每 1%（0.01）10 分、每 MB/s 减 2 分、HKG 减 30 分、NRT 减 10 分、
+其他数据中心加 20 分
+
+用法:
+    python ranking.py -f result.csv -n 5 --group colo,port
+"""
+
+import argparse
+import heapq
+import math
+import os
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from results import (
+    CARRIER_COLUMNS, COLO_COLUMNS, LOSS_COLUMNS, PORT_COLUMNS, ResultTable, iter_chunks, load_results,
+)
+
+SCORE_ENV = "RANK_SCORE"
+# 超过这个大小的结果文件分块读取（约 100 万行）
+STREAM_BYTES = 64 * 1024 * 1024
+GROUP_COLUMNS = {"carrier": CARRIER_COLUMNS, "colo": COLO_COLUMNS, "port": PORT_COLUMNS}
+
+
+class CompositeScore:
+    """
+    综合评分
+
+    Args:
+        latency: 每毫秒延迟的分数
+        loss: 丢包率（0-1）的权重
+        speed: 每 MB/s 下载速度减去的分数
+        colo: {数据中心: 加减分}
+        other: 不在 colo 中的数据中心（含未知）的加减分
+    """
+
+    def __init__(
+        self,
+        latency: float = 1.0,
+        loss: float = 0.0,
+        speed: float = 0.0,
+        colo: Optional[Dict[str, float]] = None,
+        other: float = 0.0,
+    ):
+        self.latency = latency
+        self.loss = loss
+        self.speed = speed
+        self.colo = {k.upper(): v for k, v in (colo or {}).items()}
+        self.other = other
+
+    @classmethod
+    def from_spec(cls, spec: str) -> "CompositeScore":
+        """
+        解析 "latency=1,loss=1000,speed=2,colo=HKG:-30|NRT:-10,other=20" 形式的配置，
+        未出现的项使用默认值，空字符串为默认评分（只看延迟）
+
+        Raises:
+            ValueError: 配置格式错误
+        """
+        kwargs = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            name, sep, value = item.partition("=")
+            name = name.strip().lower()
+            if not sep or name not in ("latency", "loss", "speed", "colo", "other"):
+                raise ValueError(f"无法解析评分配置: {item}")
+            if name == "colo":
+                kwargs["colo"] = {
+                    code.strip(): float(bonus)
+                    for code, _, bonus in (pair.partition(":") for pair in value.split("|") if pair.strip())
+                }
+            else:
+                kwargs[name] = float(value)
+        return cls(**kwargs)
+
+    def __call__(self, latency: Optional[float], loss: float = 0.0, speed: float = 0.0, colo: str = "") -> float:
+        if latency is None or math.isnan(latency):
+            return math.inf
+        return self.latency * latency + self.loss * loss - self.speed * speed + self.colo.get(colo.upper(), self.other)
+
+    @property
+    def latency_only(self) -> bool:
+        return not (self.loss or self.speed or self.colo or self.other)
+
+
+def score_from_env() -> CompositeScore:
+    """环境变量 RANK_SCORE 中的评分配置，未设置时只看延迟"""
+    return CompositeScore.from_spec(os.environ.get(SCORE_ENV, ""))
+
+
+def _number(value: Optional[float], default: float) -> float:
+    return default if value is None or value != value else value
+
+
+class _Columns:
+    """评分用到的各列（数值已解析），缺少的列用默认值代替"""
+
+    def __init__(self, table: ResultTable):
+        n = len(table)
+        latency_col, speed_col, colo_col = table.latency_column, table.speed_column, table.colo_column
+        loss_col = table.find(LOSS_COLUMNS)
+        self.latencies = table.numbers(latency_col) if latency_col else [None] * n
+        self.losses = table.numbers(loss_col) if loss_col else None
+        self.speeds = table.numbers(speed_col) if speed_col else None
+        self.colos = table.column(colo_col) if colo_col else None
+
+    def key(self, i: int, score: float, offset: int = 0) -> Tuple[float, float, float, float, int]:
+        loss = _number(self.losses[i], 0.0) if self.losses else 0.0
+        speed = _number(self.speeds[i], 0.0) if self.speeds else 0.0
+        return score, loss, _number(self.latencies[i], math.inf), -speed, offset + i
+
+
+def score_rows(table: ResultTable, score: CompositeScore) -> List[float]:
+    """每行的综合分数，延迟缺失的行为 inf"""
+    cols = _Columns(table)
+    inf = math.inf
+    if score.latency_only:
+        w = score.latency
+        return [inf if v is None or v != v else v * w for v in cols.latencies]
+    # 与 CompositeScore.__call__ 相同，展开成一个推导式，数百万行时省去逐行的函数调用
+    wl, wo, ws, bonus, other = score.latency, score.loss, score.speed, score.colo.get, score.other
+    losses = cols.losses or repeat(0.0)
+    speeds = cols.speeds or repeat(0.0)
+    colos = cols.colos or repeat("")
+    return [
+        inf if lat is None or lat != lat else
+        wl * lat
+        + (wo * loss if loss is not None and loss == loss else 0.0)
+        - (ws * speed if speed is not None and speed == speed else 0.0)
+        + bonus(colo.upper(), other)
+        for lat, loss, speed, colo in zip(cols.latencies, losses, speeds, colos)
+    ]
+
+
+def select_top(table: ResultTable, n: int, score: Optional[CompositeScore] = None, dedupe: bool = True) -> List[int]:
+    """
+    按综合分数选出前 n 行
+
+    先用堆从纯浮点数的分数中找出第 m 小的值作为分界，只对不超过分界的行构造完整的排序键
+    (分数, 丢包率, 延迟, -下载速度, 行号) 并排序；去重后不足 n 个时放宽分界重来
+
+    Args:
+        table: results.load_results 读取的结果
+        n: 需要的行数
+        score: 评分，默认只看延迟
+        dedupe: 同一 IP 只保留分数最好的一行
+
+    Returns:
+        从好到差的行号
+    """
+    scores = score_rows(table, score or CompositeScore())
+    if n <= 0 or not scores:
+        return []
+    cols = _Columns(table)
+    m = n
+    while True:
+        cut = heapq.nsmallest(m, scores)[-1]
+        # 分界处的同分行全部纳入，由完整排序键决定先后
+        pool = sorted(cols.key(i, s) for i, s in enumerate(scores) if s <= cut)
+        picked = [key[-1] for key in pool]
+        if dedupe:
+            picked = table.dedupe(picked)
+        # 分界以外的 IP，最好的一行也比分界差，不会排在已选中的 IP 之前
+        if len(picked) >= n or len(pool) == len(scores):
+            return picked[:n]
+        m *= 2
+
+
+class GroupTopN:
+    """
+    分块选择时一个分组的前 n 名
+
+    保存至多 2n 个不同 IP 各自最好的一行，达到 2n 个时裁剪到 n 个；裁剪后的第 n 名即为分界，
+    之后排序键不优于分界的行直接丢弃。内存只与 n 有关，与读入的行数无关
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.best: Dict[str, Tuple[Tuple, Tuple[str, ...]]] = {}
+        self.cutoff: Optional[Tuple] = None
+
+    @property
+    def cut_score(self) -> float:
+        """分界的分数，分数更高的行不可能入选"""
+        return math.inf if self.cutoff is None else self.cutoff[0]
+
+    def add(self, ip: str, key: Tuple, row: Tuple[str, ...]) -> None:
+        if self.n <= 0 or (self.cutoff is not None and key >= self.cutoff):
+            return
+        old = self.best.get(ip)
+        if old is None or key < old[0]:
+            self.best[ip] = (key, row)
+            if len(self.best) >= 2 * self.n:
+                kept = heapq.nsmallest(self.n, self.best.items(), key=lambda item: item[1][0])
+                self.best = dict(kept)
+                self.cutoff = kept[-1][1][0]
+
+    def rows(self) -> List[Tuple[str, ...]]:
+        """从好到差的前 n 行"""
+        return [row for _, row in sorted(self.best.values(), key=itemgetter(0))[:self.n]]
+
+
+def stream_select(
+    path: str,
+    n: int,
+    score: Optional[CompositeScore] = None,
+    group_by: Iterable[str] = (),
+    carrier: str = "",
+    chunk_rows: int = 65536,
+) -> Dict[Tuple[str, ...], ResultTable]:
+    """
+    分块读取结果文件，按分组选出前 n 个 IP（同一 IP 只保留分数最好的一行），排序规则与 select_top 相同
+
+    每块只保留选择用到的列；先用每组当前的分界分数过滤，只有可能入选的行才构造排序键
+
+    Args:
+        path: 结果文件
+        n: 每组需要的个数
+        score: 评分，默认只看延迟
+        group_by: 分组字段，可选 carrier / colo / port，为空时不分组
+        carrier: 文件中没有“运营商”列时使用的运营商
+        chunk_rows: 每块的行数
+
+    Returns:
+        {分组值的元组: 只含入选行的 ResultTable（已按从好到差排列）}，不分组时键为 ()
+    """
+    score = score or CompositeScore()
+    group_by = list(group_by)
+    trackers: Dict[Tuple[str, ...], GroupTopN] = {} if group_by else {(): GroupTopN(n)}
+    columns: List[str] = []
+    offset = 0
+    for chunk in iter_chunks(path, chunk_rows=chunk_rows):
+        columns = chunk.columns
+        scores = score_rows(chunk, score)
+        cols = _Columns(chunk)
+        ips = chunk.ips
+        data = [chunk.column(name) for name in columns]
+
+        def add(tracker: GroupTopN, i: int) -> None:
+            tracker.add(ips[i].strip(), cols.key(i, scores[i], offset), tuple(column[i] for column in data))
+
+        if not group_by:
+            tracker = trackers[()]
+            cut = tracker.cut_score
+            for i in [i for i, s in enumerate(scores) if s <= cut]:
+                add(tracker, i)
+        else:
+            group_columns = []
+            for field in group_by:
+                name = chunk.find(GROUP_COLUMNS[field])
+                if name:
+                    group_columns.append([v.strip() for v in chunk.column(name)])
+                else:
+                    group_columns.append(repeat(carrier if field == "carrier" else ""))
+            for i, (s, group) in enumerate(zip(scores, zip(*group_columns))):
+                tracker = trackers.get(group)
+                if tracker is None:
+                    tracker = trackers[group] = GroupTopN(n)
+                if s <= tracker.cut_score:
+                    add(tracker, i)
+        offset += len(chunk)
+
+    selected = {}
+    for group, tracker in sorted(trackers.items()):
+        rows = tracker.rows()
+        selected[group] = ResultTable(columns, {name: [row[j] for row in rows] for j, name in enumerate(columns)}, path)
+    return selected
+
+
+def select_top_file(path: str, n: int, score: Optional[CompositeScore] = None,
+                    stream_above: int = STREAM_BYTES) -> Tuple[ResultTable, List[int]]:
+    """
+    从结果文件选出前 n 个 IP：文件不大时整表读入用 select_top，超过 stream_above 字节时用 stream_select
+
+    Returns:
+        (结果表, 从好到差的行号)，分块读取时结果表只含入选的行
+    """
+    if os.path.getsize(path) > stream_above:
+        table = stream_select(path, n, score)[()]
+        return table, list(range(len(table)))
+    table = load_results(path)
+    return table, select_top(table, n, score)
+
+
+def select_top_array(scores, n: int):
+    """
+    数组形式的前 n 名：partition 找出第 n 小的值，选出 n 个再只对这 n 个排序，不对整个数组排序
+
+    Args:
+        scores: 分数数组（numpy 数组或序列），越小越好
+        n: 需要的个数
+
+    Returns:
+        从好到差的下标数组（同分时下标小者优先，NaN 最差）
+    """
+    import numpy as np
+
+    scores = np.asarray(scores)
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    if n < len(scores):
+        # 第 n 小的值；与它相同的值可能很多，按下标取前几个，结果与稳定排序一致
+        kth = np.partition(scores, n - 1)[n - 1]
+        if np.isnan(kth):
+            better, tied = ~np.isnan(scores), np.isnan(scores)
+        else:
+            better, tied = scores < kth, scores == kth
+        head = np.flatnonzero(better)
+        picked = np.concatenate([head, np.flatnonzero(tied)[:n - len(head)]])
+    else:
+        picked = np.arange(len(scores))
+    return picked[np.lexsort((picked, scores[picked]))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按综合评分分块选出每组前 N 个 IP")
+    parser.add_argument("-f", dest="file", default="result.csv", help="测速结果文件")
+    parser.add_argument("-n", dest="top_n", type=int, default=10, help="每组的 IP 数")
+    parser.add_argument("--group", default="", help="分组字段，逗号分隔，可选 " + " / ".join(GROUP_COLUMNS))
+    parser.add_argument("--carrier", default="", help="文件中没有“运营商”列时使用的运营商")
+    parser.add_argument("--chunk", type=int, default=65536, help="每块的行数")
+    args = parser.parse_args()
+
+    group_by = [field.strip() for field in args.group.split(",") if field.strip()]
+    unknown = [field for field in group_by if field not in GROUP_COLUMNS]
+    if unknown:
+        parser.error(f"未知的分组字段: {', '.join(unknown)}")
+    selected = stream_select(args.file, args.top_n, score_from_env(), group_by, args.carrier, args.chunk)
+    for group, table in selected.items():
+        latency = table.latency_column
+        print(f"{' / '.join(group) or '全部'}：{len(table)} 个")
+        for i, ip in enumerate(table.ips):
+            print(f" - {ip}  延迟 {table.column(latency)[i] if latency else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+测速结果读取（不依赖 pandas）
+- 支持 CloudflareST 格式（IP 地址,…,平均延迟,下载速度(MB/s),地区码）和
+  dianxin.csv / yidong.csv 格式（IP地址,端口,…,TCP延迟(ms),速度(MB/s)）
+- 用标准库 csv 一次解析成按列存放的表，同一进程内按文件路径和修改时间缓存，
+  xn.py / yd.py / huoqdn.py 中的多个输出函数共用一次解析
+- 只依赖标准库，启动比导入 pandas 快一个数量级（见 bench/bench_result_loader.py）
+- 数百万行的文件可用 iter_chunks 分块读取，只保留需要的列，内存与文件大小无关
+"""
+
+import csv
+import os
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 两种格式中含义相同的列
+IP_COLUMNS = ["IP 地址", "IP地址"]
+LATENCY_COLUMNS = ["平均延迟", "TCP延迟(ms)"]
+SPEED_COLUMNS = ["下载速度(MB/s)", "速度(MB/s)"]
+COLO_COLUMNS = ["地区码", "数据中心"]
+PORT_COLUMNS = ["端口"]
+LOSS_COLUMNS = ["丢包率"]
+CARRIER_COLUMNS = ["运营商"]
+# 选择 IP 时用到的全部列，iter_chunks 只保留这些
+SELECT_COLUMNS = IP_COLUMNS + LATENCY_COLUMNS + SPEED_COLUMNS + COLO_COLUMNS + PORT_COLUMNS + LOSS_COLUMNS + CARRIER_COLUMNS
+
+_cache: Dict[str, Tuple[Tuple[int, int], "ResultTable"]] = {}
+
+
+def _to_number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class ResultTable:
+    """
+    按列存放的测速结果
+
+    columns 为表头顺序的列名，每列是字符串列表；数值列可用 numbers() 取得浮点数
+    """
+
+    def __init__(self, columns: List[str], data: Dict[str, List[str]], path: str = ""):
+        self.columns = columns
+        self.data = data
+        self.path = path
+        self._numbers: Dict[str, List[Optional[float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def column(self, key) -> List[str]:
+        """按列名或列序号取一列"""
+        return self.data[self.columns[key] if isinstance(key, int) else key]
+
+    def find(self, candidates: List[str]) -> Optional[str]:
+        """返回 candidates 中第一个存在的列名"""
+        return next((name for name in candidates if name in self.data), None)
+
+    def numbers(self, key) -> List[Optional[float]]:
+        """数值形式的一列，空值和无法解析的值为 None"""
+        name = self.columns[key] if isinstance(key, int) else key
+        if name not in self._numbers:
+            self._numbers[name] = [_to_number(v) for v in self.data[name]]
+        return self._numbers[name]
+
+    def values(self, key) -> list:
+        """
+        与 pandas.read_csv 推断类型后相同的一列：全为整数时为 int，全为数字时为 float
+        （空值为 nan），否则为字符串（空值为 "nan"），格式化输出与原来用 pandas 时一致
+        """
+        name = self.columns[key] if isinstance(key, int) else key
+        raw = self.data[name]
+        numbers = self.numbers(name)
+        if all(n is not None for n, v in zip(numbers, raw) if v != ""):
+            if all(v != "" for v in raw) and all(n.is_integer() and "." not in v for n, v in zip(numbers, raw)):
+                return [int(n) for n in numbers]
+            return [float("nan") if n is None else n for n in numbers]
+        return [v if v != "" else "nan" for v in raw]
+
+    @property
+    def ips(self) -> List[str]:
+        return self.column(self.find(IP_COLUMNS) or 0)
+
+    @property
+    def latency_column(self) -> Optional[str]:
+        return self.find(LATENCY_COLUMNS)
+
+    @property
+    def speed_column(self) -> Optional[str]:
+        return self.find(SPEED_COLUMNS)
+
+    @property
+    def colo_column(self) -> Optional[str]:
+        return self.find(COLO_COLUMNS)
+
+    def ports(self, default: int) -> List[str]:
+        """每行的端口，没有端口列时全部为 default"""
+        name = self.find(PORT_COLUMNS)
+        return self.column(name) if name else [str(default)] * len(self)
+
+    def order_by(self, key, descending: bool = False) -> List[int]:
+        """
+        按一列排序后的行号（稳定排序）
+
+        与 pandas.read_csv + sort_values 的结果一致：整列都能解析为数字时按数值排序，
+        否则按字符串排序；空值排在最后
+        """
+        name = self.columns[key] if isinstance(key, int) else key
+        raw = self.data[name]
+        numbers = self.numbers(name)
+        numeric = all(n is not None for n, v in zip(numbers, raw) if v != "")
+        values = numbers if numeric else raw
+        present = [i for i, v in enumerate(raw) if v != ""]
+        missing = [i for i, v in enumerate(raw) if v == ""]
+        present.sort(key=lambda i: values[i], reverse=descending)
+        return present + missing
+
+    def dedupe(self, order: List[int]) -> List[int]:
+        """去掉重复的 IP，保留排序中第一次出现的行"""
+        ips = self.ips
+        first: Dict[str, int] = {}
+        for i in order:
+            first.setdefault(ips[i].strip(), i)
+        return list(first.values())
+
+
+def load_results(path: str) -> ResultTable:
+    """
+    读取测速结果 CSV，同一进程内文件未变化时直接返回缓存
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with open(key, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        columns = [name.strip() for name in next(reader, [])]
+        width = len(columns)
+        rows = [row if len(row) >= width else row + [""] * (width - len(row)) for row in reader if row]
+    # 按行读完后一次转置成列，比逐个追加快得多
+    data: Dict[str, List[str]] = {
+        name: list(values) for name, values in zip(columns, zip(*rows) if rows else [()] * width)
+    }
+
+    table = ResultTable(columns, data, key)
+    _cache[key] = (version, table)
+    return table
+
+
+def iter_chunks(path: str, wanted: Iterable[str] = SELECT_COLUMNS, chunk_rows: int = 65536) -> Iterator[ResultTable]:
+    """
+    分块读取测速结果，只保留 wanted 中存在的列，每块为一个最多 chunk_rows 行的 ResultTable（不缓存）；
+    只有表头的文件也会得到一个空块
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    wanted = set(wanted)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        keep = [i for i, name in enumerate(header) if name in wanted and name not in header[:i]]
+        columns = [header[i] for i in keep]
+        first = True
+        while True:
+            batch = list(islice(reader, chunk_rows))
+            if not batch and not first:
+                break
+            first = False
+            rows = [row for row in batch if row]
+            data = {name: [row[i] if len(row) > i else "" for row in rows] for name, i in zip(columns, keep)}
+            yield ResultTable(columns, data, path)
@@ -0,0 +1,289 @@
+"""
+下载测速，可替代 CloudflareST 的下载测速阶段（-dd 以外的 -dn / -dt / -sl / -url）
+- 直接连接指定 IP，TLS SNI 与 Host 头使用测速 URL 中的域名
+- 按滑动窗口计算吞吐，速度下限已确认达到或明显达不到时提前结束
+- 多个 IP 并行测试，所有连接共享一个全局带宽预算
+- 顺便从响应头 cf-ray 中解析数据中心（地区码）
+
+用法:
+    python speedtest.py -f result.csv -url https://speed.example.com/100mb -dn 10 -dt 10 -sl 1
+"""
+
+import argparse
+import asyncio
+import csv
+import ssl
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from probe import EXTRA_COLUMNS, RESULT_HEADER, write_result_csv
+
+MB = 1024 * 1024
+READ_SIZE = 64 * 1024
+
+
+class BandwidthLimiter:
+    """
+    令牌桶：所有测速连接共享的全局带宽预算
+
+    Args:
+        rate: 每秒允许读取的字节数
+        burst: 桶容量，默认 0.1 秒的额度
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(rate * 0.1, READ_SIZE)
+        self.tokens = self.capacity
+        self.updated = time.perf_counter()
+
+    async def consume(self, amount: int) -> None:
+        while True:
+            now = time.perf_counter()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def parse_colo(cf_ray: str) -> str:
+    """从 cf-ray（如 8c2a6f0d3b5e1234-HKG）中取出数据中心代码"""
+    return cf_ray.rsplit("-", 1)[1].upper() if "-" in cf_ray else ""
+
+
+async def download_speed(
+    ip: str,
+    url: str,
+    duration: float = 10.0,
+    min_speed: Optional[float] = None,
+    window: float = 1.0,
+    limiter: Optional[BandwidthLimiter] = None,
+    connect_timeout: float = 5.0,
+    verify: bool = True,
+) -> Dict:
+    """
+    从指定 IP 下载测速 URL 并测量吞吐
+
+    提前结束的条件（仅在设置 min_speed 时生效，且至少测满两个窗口）:
+    - 最近两个窗口的吞吐都不低于 min_speed：已确认达标
+    - 到目前为止最好的窗口吞吐都不到 min_speed 的一半：明显不达标
+    提前结束时报告的 speed 是作出判断的窗口吞吐（达标为最近两个窗口中较低的一个，不达标为最好的窗口），
+    因此 speed >= min_speed 与提前判断的结果一致；其余情况为整个下载过程的平均吞吐
+
+    Args:
+        ip: 连接的 IP
+        url: 测速文件 URL，域名用于 SNI 和 Host 头
+        duration: 最长下载秒数（对应 CloudflareST 的 -dt）
+        min_speed: 速度下限 MB/s（对应 CloudflareST 的 -sl）
+        window: 滑动窗口秒数
+        limiter: 共享的带宽预算
+        connect_timeout: 连接和等待响应头的超时秒数
+        verify: 是否校验证书
+
+    Returns:
+        {"ip", "speed"(MB/s), "bytes", "elapsed", "colo", "stopped", "error"}
+        stopped 为 "pass" / "fail" / "time" / "eof"
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    result = {"ip": ip, "speed": 0.0, "bytes": 0, "elapsed": 0.0, "colo": "", "stopped": "", "error": None}
+
+    ssl_ctx = None
+    if https:
+        ssl_ctx = ssl.create_default_context()
+        if not verify:
+            ssl_ctx.check_hostname = False
+            ssl_ctx.verify_mode = ssl.CERT_NONE
+
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip, port, ssl=ssl_ctx, server_hostname=parts.hostname if https else None),
+            connect_timeout,
+        )
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: Mozilla/5.0\r\n"
+            f"Accept: */*\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), connect_timeout)
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in header_lines if line)}
+        result["colo"] = parse_colo(headers.get("cf-ray", ""))
+        if status_line.split()[1] != "200":
+            result["error"] = status_line
+            return result
+
+        start = time.perf_counter()
+        deadline = start + duration
+        total = 0
+        history = deque([(start, 0)])  # (时间, 累计字节)
+        window_speeds = []  # 每个完整窗口的吞吐 MB/s
+        next_window = start + window
+        speed = None  # 提前结束时作出判断的窗口吞吐
+
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                result["stopped"] = "time"
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(READ_SIZE), remaining)
+            except asyncio.TimeoutError:
+                result["stopped"] = "time"
+                break
+            if not chunk:
+                result["stopped"] = "eof"
+                break
+            if limiter:
+                # 按实际读到的字节数扣除额度，慢连接的小块读取不会占用其他连接的预算
+                await limiter.consume(len(chunk))
+
+            now = time.perf_counter()
+            total += len(chunk)
+            history.append((now, total))
+            while len(history) > 2 and history[1][0] <= now - window:
+                history.popleft()
+
+            if now >= next_window:
+                span = now - history[0][0]
+                window_speeds.append((total - history[0][1]) / span / MB if span > 0 else 0.0)
+                next_window = now + window
+                if min_speed is not None and len(window_speeds) >= 2:
+                    if min(window_speeds[-2:]) >= min_speed:
+                        result["stopped"] = "pass"
+                        speed = min(window_speeds[-2:])
+                        break
+                    if max(window_speeds) < min_speed / 2:
+                        result["stopped"] = "fail"
+                        speed = max(window_speeds)
+                        break
+
+        elapsed = time.perf_counter() - start
+        if speed is None:
+            speed = total / elapsed / MB if elapsed > 0 else 0.0
+        result.update(bytes=total, elapsed=elapsed, speed=speed)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, IndexError) as e:
+        result["error"] = str(e) or type(e).__name__
+    finally:
+        if writer is not None:
+            writer.close()
+    return result
+
+
+async def test_many(
+    ips: List[str],
+    url: str,
+    count: int = 10,
+    concurrency: int = 4,
+    duration: float = 10.0,
+    min_speed: Optional[float] = None,
+    budget: Optional[float] = None,
+    verify: bool = True,
+) -> List[Dict]:
+    """
+    按顺序并行测试 IP，直到有 count 个达到速度下限（未设置下限时测满 count 个）
+
+    Args:
+        ips: 按延迟排好序的 IP
+        url: 测速 URL
+        count: 需要的 IP 数（对应 CloudflareST 的 -dn）
+        concurrency: 同时测速的 IP 数
+        duration: 每个 IP 最长下载秒数
+        min_speed: 速度下限 MB/s
+        budget: 所有连接合计的带宽上限 MB/s，None 表示不限制
+        verify: 是否校验证书
+
+    Returns:
+        已测试 IP 的 download_speed 结果
+    """
+    limiter = BandwidthLimiter(budget * MB) if budget else None
+    targets = iter(ips)
+    results: List[Dict] = []
+
+    def enough() -> bool:
+        return sum(1 for r in results if r["error"] is None and (min_speed is None or r["speed"] >= min_speed)) >= count
+
+    async def worker():
+        for ip in targets:
+            if enough():
+                return
+            r = await download_speed(ip, url, duration, min_speed, limiter=limiter, verify=verify)
+            results.append(r)
+            status = r["error"] or f"{r['speed']:.2f} MB/s ({r['stopped']})"
+            print(f" - {ip} {r['colo']}: {status}")
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def read_result_csv(path: str) -> List[Dict]:
+    """读取 probe.py / CloudflareST 输出的 result.csv，可带 probe.EXTRA_COLUMNS 中的追加列"""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        if header[:len(RESULT_HEADER)] != RESULT_HEADER:
+            raise ValueError(f"{path} 不是 CloudflareST 格式的结果文件")
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            r = {
+                "ip": row[0],
+                "sent": int(row[1]),
+                "received": int(row[2]),
+                "loss": float(row[3]),
+                "avg": float(row[4]),
+                "speed": float(row[5]),
+                "colo": row[6],
+            }
+            extra = dict(zip(header[len(RESULT_HEADER):], row[len(RESULT_HEADER):]))
+            for key, name, _, parse in EXTRA_COLUMNS:
+                if name in extra:
+                    r[key] = parse(extra[name]) if extra[name] else None
+            rows.append(r)
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载测速（CloudflareST 兼容参数）")
+    parser.add_argument("-f", dest="file", default="result.csv", help="延迟测试结果，按顺序取 IP 测速")
+    parser.add_argument("-url", dest="url", required=True, help="测速文件 URL")
+    parser.add_argument("-dn", dest="count", type=int, default=10, help="需要的 IP 数")
+    parser.add_argument("-dt", dest="duration", type=float, default=10, help="每个 IP 最长下载秒数")
+    parser.add_argument("-sl", dest="min_speed", type=float, default=None, help="下载速度下限 MB/s")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("--parallel", type=int, default=4, help="同时测速的 IP 数")
+    parser.add_argument("--budget", type=float, default=None, help="全局带宽上限 MB/s")
+    parser.add_argument("--insecure", action="store_true", help="不校验证书")
+    args = parser.parse_args()
+
+    rows = read_result_csv(args.file)
+    print(f"开始下载测速: 候选 {len(rows)} 个，需要 {args.count} 个，并行 {args.parallel}")
+    start = time.perf_counter()
+    tested = asyncio.run(test_many(
+        [r["ip"] for r in rows], args.url, args.count, args.parallel,
+        args.duration, args.min_speed, args.budget, not args.insecure,
+    ))
+
+    by_ip = {r["ip"]: r for r in tested if r["error"] is None}
+    passed = []
+    for row in rows:
+        r = by_ip.get(row["ip"])
+        if r and (args.min_speed is None or r["speed"] >= args.min_speed):
+            passed.append(dict(row, speed=r["speed"], colo=r["colo"] or row["colo"]))
+    # 与 CloudflareST 一致，测速后按下载速度降序排列
+    passed.sort(key=lambda r: r["speed"], reverse=True)
+    write_result_csv(passed[:args.count], args.output)
+    print(f"下载测速完成，用时 {time.perf_counter() - start:.2f}s，达标 {len(passed)} 个，已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+延迟样本的向量化统计
+- 原始样本保存为 IP × 样本 的 float32 矩阵，失败（丢包）记为 NaN；
+  probe.py 测试前按 IP 数预分配 SampleMatrix，样本直接写入矩阵，结果中只记录行号 "row"
+- 各 IP 的测试次数可以不同（如 adaptive.py），sent 数组记录每行的有效列数，之后的列为填充
+- 一次计算平均值、中位数、p90 / p99、抖动（标准差）和丢包率，数十万个 IP 也只需几十毫秒
+- 按 chunk_rows 行分块计算，临时数组的内存与总行数无关
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 统计字段，probe.EXTRA_COLUMNS 中有对应的输出列
+STAT_FIELDS = ["median", "p90", "p99", "jitter"]
+
+
+def sample_matrix(results: List[Dict], width: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把 probe.summarize 结果中的 samples 排成矩阵
+
+    Args:
+        results: 带 "samples" 的结果
+        width: 列数，默认为最多的测试次数
+
+    Returns:
+        (float32 矩阵（丢包和填充为 NaN）, 每行的测试次数 sent)
+    """
+    sent = np.fromiter((len(r["samples"]) for r in results), dtype=np.int32, count=len(results))
+    width = width or (int(sent.max()) if len(sent) else 0)
+    matrix = np.full((len(results), width), np.nan, dtype=np.float32)
+    for i, r in enumerate(results):
+        row = r["samples"][:width]
+        matrix[i, :len(row)] = [np.nan if ms is None else ms for ms in row]
+    return matrix, np.minimum(sent, width)
+
+
+class SampleMatrix:
+    """
+    预分配的 IP × 样本 float32 矩阵
+
+    Args:
+        rows: IP 数
+        width: 每个 IP 最多的样本数
+    """
+
+    def __init__(self, rows: int, width: int):
+        self.values = np.full((rows, width), np.nan, dtype=np.float32)
+        self.sent = np.zeros(rows, dtype=np.int32)
+
+    def set_row(self, row: int, latencies: List[Optional[float]]) -> None:
+        """写入一个 IP 的样本（毫秒），失败记为 None"""
+        latencies = latencies[:self.values.shape[1]]
+        self.values[row, :len(latencies)] = [np.nan if ms is None else ms for ms in latencies]
+        self.sent[row] = len(latencies)
+
+    def samples(self, row: int) -> List[Optional[float]]:
+        """一个 IP 的样本列表，丢包为 None"""
+        return [None if v != v else v for v in self.values[row, :self.sent[row]].tolist()]
+
+
+def _quantile_sorted(ordered: np.ndarray, received: np.ndarray, q: float) -> np.ndarray:
+    """每行前 received 个值已升序排好，按线性插值取分位数，没有有效值的行为 NaN"""
+    pos = (np.maximum(received, 1) - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(received - 1, 0))
+    rows = np.arange(len(ordered))
+    lo_val = ordered[rows, lo]
+    hi_val = ordered[rows, hi]
+    with np.errstate(invalid="ignore"):  # 全部丢包的行为 inf - inf，下面会置为 NaN
+        value = lo_val + (hi_val - lo_val) * (pos - lo).astype(np.float32)
+    value[received == 0] = np.nan
+    return value
+
+
+def compute_stats(matrix: np.ndarray, sent: Optional[np.ndarray] = None, chunk_rows: int = 65536) -> Dict[str, np.ndarray]:
+    """
+    分块计算每个 IP 的统计量
+
+    Args:
+        matrix: sample_matrix 返回的矩阵
+        sent: 每行的测试次数，默认为列数
+        chunk_rows: 每块的行数
+
+    Returns:
+        {"sent", "received", "loss", "mean", "median", "p90", "p99", "jitter"}，
+        均为长度等于行数的数组，全部丢包的 IP 统计量为 NaN
+    """
+    n = len(matrix)
+    if sent is None:
+        sent = np.full(n, matrix.shape[1], dtype=np.int32)
+    out = {
+        "sent": sent.astype(np.int32),
+        "received": np.empty(n, dtype=np.int32),
+        "loss": np.empty(n, dtype=np.float32),
+    }
+    for name in ["mean"] + STAT_FIELDS:
+        out[name] = np.empty(n, dtype=np.float32)
+
+    for a in range(0, n, chunk_rows):
+        b = min(a + chunk_rows, n)
+        block = matrix[a:b]
+        ok = ~np.isnan(block)
+        received = ok.sum(axis=1)
+        safe = np.maximum(received, 1)
+        total = np.where(ok, block, 0).sum(axis=1, dtype=np.float64)
+        mean = total / safe
+        sq = np.where(ok, (block - mean[:, None].astype(np.float32)) ** 2, 0).sum(axis=1, dtype=np.float64)
+
+        # NaN 换成 +inf 后按行排序，有效值都排在前 received 列
+        ordered = np.sort(np.where(ok, block, np.inf), axis=1)
+
+        out["received"][a:b] = received
+        out["loss"][a:b] = np.where(sent[a:b] > 0, 1 - received / np.maximum(sent[a:b], 1), 1.0)
+        out["mean"][a:b] = np.where(received > 0, mean, np.nan)
+        out["jitter"][a:b] = np.where(received > 0, np.sqrt(sq / safe), np.nan)
+        out["median"][a:b] = _quantile_sorted(ordered, received, 0.5)
+        out["p90"][a:b] = _quantile_sorted(ordered, received, 0.9)
+        out["p99"][a:b] = _quantile_sorted(ordered, received, 0.99)
+    return out
+
+
+def attach_stats(results: List[Dict], chunk_rows: int = 65536, matrix: Optional[SampleMatrix] = None) -> List[Dict]:
+    """
+    为结果补上 median / p90 / p99 / jitter 字段（毫秒，全部丢包时为 None），原地修改并返回
+
+    给出 matrix 时按结果中的行号 "row" 取矩阵中的统计量，没有行号的结果（如历史记录复用的结果）不修改；
+    否则按 chunk_rows 个结果一组把 "samples" 排成矩阵，内存占用与结果总数无关
+    """
+    if matrix is not None:
+        stats = compute_stats(matrix.values, matrix.sent, chunk_rows)
+        for name in STAT_FIELDS:
+            values = stats[name]
+            for r in results:
+                if "row" in r:
+                    v = float(values[r["row"]])
+                    r[name] = None if v != v else v
+        return results
+    for a in range(0, len(results), chunk_rows):
+        chunk = results[a:a + chunk_rows]
+        stats = compute_stats(*sample_matrix(chunk), chunk_rows=chunk_rows)
+        for name in STAT_FIELDS:
+            values = stats[name].tolist()
+            for r, v in zip(chunk, values):
+                r[name] = None if v != v else v
+    return results
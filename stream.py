@@ -0,0 +1,213 @@
+"""
+边测边选：流式输出测试结果，前 N 名稳定后提前结束
+- 每测完一个 IP 追加一行 NDJSON，其他程序可以边写边读
+- 选择器维护实时的前 N 名，每 round_size 个结果为一轮
+- 连续 patience 轮前 N 名没有变化，且本轮没进前 N 的结果都比第 N 名慢 margin 毫秒以上时，
+  认为前 N 名已经稳定，停止剩余的测试
+- 候选的顺序越好（如按 history.py 的历史表现排序），停得越早
+
+用法:
+    python stream.py -f ip.txt -tp 2087 -dn 9 -t 4 --ndjson results.ndjson -o result.csv
+    python stream.py --from results.ndjson -dn 9 -o result.csv    # 从已有的结果流中选择
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from elimination import rank_key
+from probe import iter_probe, load_targets, raise_nofile_limit, rank_results, write_result_csv
+
+
+class TopNTracker:
+    """
+    实时前 N 名与稳定性判断
+
+    Args:
+        top_n: 需要的 IP 数
+        round_size: 每轮的结果数
+        patience: 需要连续稳定的轮数
+        margin: 置信余量（毫秒），本轮落选结果与第 N 名的最小延迟差
+        max_loss: 丢包率上限，超过的结果不参与排名
+        max_avg: 平均延迟上限（毫秒）
+    """
+
+    def __init__(
+        self,
+        top_n: int = 10,
+        round_size: int = 200,
+        patience: int = 5,
+        margin: float = 5.0,
+        max_loss: float = 1.0,
+        max_avg: Optional[float] = None,
+    ):
+        self.top_n = top_n
+        self.round_size = round_size
+        self.patience = patience
+        self.margin = margin
+        self.max_loss = max_loss
+        self.max_avg = max_avg
+        self.best: List[Tuple[Tuple[float, float], str, Dict]] = []
+        self.seen = 0
+        self.stable_rounds = 0
+        self._changed = False
+        self._closest = math.inf
+
+    def _qualifies(self, r: Dict) -> bool:
+        return bool(r["received"]) and r["loss"] <= self.max_loss and (self.max_avg is None or r["avg"] <= self.max_avg)
+
+    def _gap(self, r: Dict) -> float:
+        """落选结果比第 N 名差多少毫秒，丢包率更高视为无限大"""
+        if not self._qualifies(r):
+            return math.inf
+        loss, avg = self.best[-1][0]
+        return math.inf if r["loss"] > loss else r["avg"] - avg
+
+    def add(self, r: Dict) -> bool:
+        """
+        加入一个结果
+
+        Returns:
+            前 N 名是否已经稳定，可以停止测试
+        """
+        self.seen += 1
+        if self._qualifies(r):
+            entry = (rank_key(r), r["ip"], r)
+            if len(self.best) < self.top_n or entry[:2] < self.best[-1][:2]:
+                bisect.insort(self.best, entry, key=lambda e: e[:2])
+                del self.best[self.top_n:]
+                self._changed = True
+            else:
+                self._closest = min(self._closest, self._gap(r))
+        elif self.best:
+            self._closest = min(self._closest, self._gap(r))
+
+        if self.seen % self.round_size:
+            return False
+        full = len(self.best) >= self.top_n
+        if full and not self._changed and self._closest >= self.margin:
+            self.stable_rounds += 1
+        else:
+            self.stable_rounds = 0
+        self._changed, self._closest = False, math.inf
+        return self.stable_rounds >= self.patience
+
+    def top(self) -> List[Dict]:
+        return [r for _, _, r in self.best]
+
+
+class NdjsonWriter:
+    """逐行追加结果，按行缓冲，读取方可以随时看到完整的行"""
+
+    def __init__(self, path: str, append: bool = False):
+        self.file = open(path, "a" if append else "w", encoding="utf-8", buffering=1)
+
+    def write(self, r: Dict) -> None:
+        self.file.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_ndjson(path: str) -> Iterator[Dict]:
+    """读取 NDJSON 结果，跳过写了一半的末行"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+def select(results: Iterable[Dict], tracker: TopNTracker) -> Tuple[List[Dict], bool]:
+    """
+    从结果流中选择，稳定后停止读取
+
+    Returns:
+        (已读取的结果, 是否提前停止)
+    """
+    consumed = []
+    for r in results:
+        consumed.append(r)
+        if tracker.add(r):
+            return consumed, True
+    return consumed, False
+
+
+async def probe_and_select(
+    ips: List[str],
+    port: int,
+    tracker: TopNTracker,
+    samples: int = 4,
+    concurrency: int = 300,
+    timeout: float = 1.0,
+    ndjson: Optional[str] = None,
+) -> Tuple[List[Dict], bool]:
+    """
+    边测边选，前 N 名稳定后取消剩余的测试
+
+    Returns:
+        (已完成的测试结果, 是否提前停止)
+    """
+    writer = NdjsonWriter(ndjson) if ndjson else None
+    results = []
+    stream = iter_probe(ips, port, samples, concurrency, timeout)
+    try:
+        async for r in stream:
+            results.append(r)
+            if writer:
+                writer.write(r)
+            if tracker.add(r):
+                return results, True
+        return results, False
+    finally:
+        await stream.aclose()
+        if writer:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="边测边选，前 N 名稳定后提前结束")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-t", dest="samples", type=int, default=4, help="每个 IP 的测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=300, help="并发连接数")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="测试端口")
+    parser.add_argument("-dn", dest="top_n", type=int, default=10, help="需要的 IP 数")
+    parser.add_argument("-tl", dest="max_avg", type=float, default=None, help="平均延迟上限（毫秒）")
+    parser.add_argument("-tlr", dest="max_loss", type=float, default=1.0, help="丢包率上限（0-1）")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("--ndjson", default=None, help="逐行输出测试结果的 NDJSON 文件")
+    parser.add_argument("--from", dest="source", default=None, help="不测试，从已有的 NDJSON 结果中选择")
+    parser.add_argument("--round", dest="round_size", type=int, default=200, help="每轮的结果数")
+    parser.add_argument("--patience", type=int, default=5, help="前 N 名需要连续稳定的轮数")
+    parser.add_argument("--margin", type=float, default=5.0, help="置信余量（毫秒）")
+    parser.add_argument("--timeout", type=float, default=1.0, help="单次连接超时秒数")
+    args = parser.parse_args()
+
+    tracker = TopNTracker(args.top_n, args.round_size, args.patience, args.margin, args.max_loss, args.max_avg)
+    start = time.perf_counter()
+    if args.source:
+        results, stopped = select(read_ndjson(args.source), tracker)
+        total = None
+    else:
+        raise_nofile_limit(args.concurrency)
+        ips = load_targets(args.file)
+        total = len(ips)
+        print(f"开始延迟测试: {total} 个 IP，端口 {args.port}，需要 {args.top_n} 个，每 {args.round_size} 个结果检查一次")
+        results, stopped = asyncio.run(probe_and_select(
+            ips, args.port, tracker, args.samples, args.concurrency, args.timeout, args.ndjson,
+        ))
+
+    ranked = rank_results(results, args.max_loss, args.max_avg)
+    write_result_csv(ranked, args.output)
+    status = f"前 {args.top_n} 名连续 {args.patience} 轮稳定，提前结束" if stopped else "全部结果已处理"
+    progress = f"{len(results)}/{total}" if total is not None else f"{len(results)}"
+    print(f"{status}，用时 {time.perf_counter() - start:.2f}s，处理 {progress} 个，已保存到 {args.output}")
+    for r in tracker.top():
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  平均延迟 {r['avg']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+先子网后 IP 的两级搜索，用于覆盖整个 Cloudflare 网段（如 104.16.0.0/12）
+- 第一级：每个子网（默认 /24）只测一个或几个代表地址，按丢包率、平均延迟给子网排名
+- 第二级：只在排名靠前的子网内继续展开测试，直到凑够需要的前 N 个 IP
+同一 /24 内的延迟高度相关，因此不必逐个测试整段地址
+
+用法:
+    python subnets.py -f iphome.txt -tp 2087 -dn 10 -o result.csv
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from candidates import sample_per_24
+from elimination import rank_key
+from ipset import ips_to_strings, load_ranges
+from probe import probe_many, raise_nofile_limit, rank_results, summarize, write_result_csv
+
+
+def pick_representatives(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    prefix: int = 24,
+    reps: int = 1,
+    seed: Optional[int] = None,
+) -> Dict[int, np.ndarray]:
+    """
+    为每个子网随机挑选代表地址
+
+    Args:
+        starts, ends: ipset.parse_ranges 返回的区间
+        prefix: 子网前缀长度，8-24
+        reps: 每个子网的代表地址数
+        seed: 随机种子
+
+    Returns:
+        {子网编号(地址 >> (32 - prefix)): 代表地址 uint32 数组}
+    """
+    if not 8 <= prefix <= 24:
+        raise ValueError("子网前缀长度需在 8 到 24 之间")
+    addrs = np.concatenate(list(sample_per_24(starts, ends, reps, seed=seed)) or [np.empty(0, dtype=np.uint32)])
+    # 打乱后按子网稳定排序，每个子网取前 reps 个，即为子网内的随机代表
+    rng = np.random.default_rng(seed)
+    addrs = addrs[rng.permutation(len(addrs))]
+    keys = addrs >> np.uint32(32 - prefix)
+    order = np.argsort(keys, kind="stable")
+    addrs, keys = addrs[order], keys[order]
+    group_starts, group_stops = _group_bounds(keys)
+    return {int(keys[a]): addrs[a:min(b, a + reps)] for a, b in zip(group_starts, group_stops)}
+
+
+def _group_bounds(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return starts, np.r_[starts[1:], len(keys)]
+
+
+def subnet_hosts(
+    key: int,
+    prefix: int,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    count: int,
+    exclude: np.ndarray,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """在一个子网与原始网段的交集内随机取 count 个未测试过的主机地址"""
+    block_start = key << (32 - prefix)
+    block_end = block_start + (1 << (32 - prefix)) - 1
+    overlap = (starts.astype(np.int64) <= block_end) & (ends.astype(np.int64) >= block_start)
+    sub_starts = np.maximum(starts[overlap].astype(np.int64), block_start).astype(np.uint32)
+    sub_ends = np.minimum(ends[overlap].astype(np.int64), block_end).astype(np.uint32)
+
+    # 子网内的 /24 数量有限，直接在每个 /24 内多取一些，再整体随机截取
+    per_24 = max(1, -(-(count + len(exclude)) // max(1, 1 << (24 - prefix))))
+    hosts = np.concatenate(list(sample_per_24(sub_starts, sub_ends, per_24, seed=seed)) or [np.empty(0, dtype=np.uint32)])
+    hosts = np.setdiff1d(hosts, exclude)
+    rng = np.random.default_rng(seed)
+    return rng.permutation(hosts)[:count]
+
+
+async def hierarchical_search(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    port: int,
+    top_n: int = 10,
+    prefix: int = 24,
+    reps: int = 1,
+    subnets_per_round: int = 10,
+    hosts_per_subnet: int = 16,
+    samples: int = 4,
+    concurrency: int = 300,
+    timeout: float = 1.0,
+    max_loss: float = 1.0,
+    max_avg: Optional[float] = None,
+    seed: Optional[int] = None,
+) -> List[Dict]:
+    """
+    两级搜索
+
+    1. 每个子网测试 reps 个代表地址，合并代表地址的样本给子网排名
+    2. 按子网排名，每轮展开 subnets_per_round 个子网，每个子网再测 hosts_per_subnet 个地址，
+       直到满足条件（丢包率 ≤ max_loss、平均延迟 ≤ max_avg）的 IP 达到 top_n 个或子网用完
+
+    Returns:
+        全部测试过的 IP 的 probe_ip 结果，已按 probe.rank_results 过滤排序
+    """
+    groups = pick_representatives(starts, ends, prefix, reps, seed)
+    rep_ips = ips_to_strings(np.concatenate(list(groups.values()) or [np.empty(0, dtype=np.uint32)]))
+    print(f"第一级: {len(groups)} 个 /{prefix} 子网，测试 {len(rep_ips)} 个代表地址")
+    results = {r["ip"]: r for r in await probe_many(rep_ips, port, samples, concurrency, timeout)}
+
+    subnet_rank = []
+    for key, addrs in groups.items():
+        merged = []
+        for ip in ips_to_strings(addrs):
+            merged.extend(results[ip]["samples"])
+        subnet_rank.append((rank_key(summarize("", merged)), key))
+    subnet_rank.sort()
+    ordered = [key for score, key in subnet_rank if score[0] < 1]  # 代表地址全部丢包的子网直接跳过
+
+    for i in range(0, len(ordered), subnets_per_round):
+        # 至少展开一轮：最好的 IP 通常就在排名最前的子网里
+        if i and len(rank_results(list(results.values()), max_loss, max_avg)) >= top_n:
+            break
+        batch = ordered[i:i + subnets_per_round]
+        hosts = []
+        for key in batch:
+            subnet_seed = None if seed is None else seed + key
+            hosts.extend(ips_to_strings(subnet_hosts(key, prefix, starts, ends, hosts_per_subnet, groups[key], subnet_seed)))
+        print(f"第二级: 展开第 {i + 1}-{i + len(batch)} 名子网，测试 {len(hosts)} 个地址")
+        for r in await probe_many(hosts, port, samples, concurrency, timeout):
+            results[r["ip"]] = r
+
+    return rank_results(list(results.values()), max_loss, max_avg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="先子网后 IP 的两级延迟测试")
+    parser.add_argument("-f", dest="files", action="append", help="CIDR 文件，可重复，默认 iphome.txt")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="测试端口")
+    parser.add_argument("-dn", dest="top_n", type=int, default=10, help="需要的 IP 数")
+    parser.add_argument("-t", dest="samples", type=int, default=4, help="每个 IP 的测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=300, help="并发连接数")
+    parser.add_argument("-tl", dest="max_avg", type=float, default=None, help="平均延迟上限（毫秒）")
+    parser.add_argument("-tlr", dest="max_loss", type=float, default=1.0, help="丢包率上限（0-1）")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("--prefix", type=int, default=24, help="子网前缀长度")
+    parser.add_argument("--reps", type=int, default=1, help="每个子网的代表地址数")
+    parser.add_argument("--subnets", type=int, default=10, help="每轮展开的子网数")
+    parser.add_argument("--hosts", type=int, default=16, help="每个展开子网再测试的地址数")
+    parser.add_argument("--timeout", type=float, default=1.0, help="单次连接超时秒数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    raise_nofile_limit(args.concurrency)
+    starts, ends = load_ranges(*(args.files or ["iphome.txt"]))
+
+    start = time.perf_counter()
+    ranked = asyncio.run(hierarchical_search(
+        starts, ends, args.port, args.top_n, args.prefix, args.reps, args.subnets, args.hosts,
+        args.samples, args.concurrency, args.timeout, args.max_loss, args.max_avg, args.seed,
+    ))
+    write_result_csv(ranked, args.output)
+    print(f"测试完成，用时 {time.perf_counter() - start:.2f}s，可用 {len(ranked)} 个，已保存到 {args.output}")
+    for r in ranked[:args.top_n]:
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  平均延迟 {r['avg']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+TLS 延迟测试：分别测量 TCP 连接、TLS 握手、首字节时间（TTFB）
+- 每个 IP 第一次完整握手后保存会话票据，之后的测试用票据复用会话，握手更便宜，也更接近客户端的实际体验
+- 在非阻塞 socket 上用 ssl.SSLObject + MemoryBIO 自己驱动握手，每一步的耗时都能单独计时
+- 首字节时间为发出 GET /cdn-cgi/trace 到收到第一个响应字节的耗时
+- result.csv 的平均延迟仍是 TCP 连接耗时（与 CloudflareST 一致），另追加 TLS握手 / 复用握手 / 首字节 三列
+
+用法:
+    python tls.py -f ip.txt -tp 2087 --host example.com -t 4 -o result.csv
+"""
+
+import argparse
+import asyncio
+import socket
+import ssl
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from colo import TRACE_HOST, TRACE_PATH
+from probe import load_targets, raise_nofile_limit, rank_results, summarize, write_result_csv
+
+RECV_SIZE = 16 * 1024
+
+
+def make_context(verify: bool = True) -> ssl.SSLContext:
+    ctx = ssl.create_default_context()
+    if not verify:
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+async def _flush(loop, sock: socket.socket, outgoing: ssl.MemoryBIO) -> None:
+    data = outgoing.read()
+    if data:
+        await loop.sock_sendall(sock, data)
+
+
+async def _feed(loop, sock: socket.socket, incoming: ssl.MemoryBIO) -> None:
+    data = await loop.sock_recv(sock, RECV_SIZE)
+    if not data:
+        raise ConnectionResetError("连接被关闭")
+    incoming.write(data)
+
+
+async def tls_sample(
+    ip: str,
+    port: int,
+    host: str,
+    ctx: ssl.SSLContext,
+    session: Optional[ssl.SSLSession] = None,
+) -> Dict:
+    """
+    一次完整的 TLS 测试：TCP 连接 → TLS 握手（有 session 时尝试复用）→ 发送请求 → 收到首字节
+
+    Returns:
+        {"connect", "handshake", "ttfb"（毫秒）, "resumed", "session"}
+    """
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        start = time.perf_counter()
+        await loop.sock_connect(sock, (ip, port))
+        connected = time.perf_counter()
+
+        incoming, outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+        tls = ctx.wrap_bio(incoming, outgoing, server_hostname=host, session=session)
+        while True:
+            try:
+                tls.do_handshake()
+                break
+            except ssl.SSLWantReadError:
+                await _flush(loop, sock, outgoing)
+                await _feed(loop, sock, incoming)
+        await _flush(loop, sock, outgoing)
+        handshaken = time.perf_counter()
+
+        tls.write(
+            f"GET {TRACE_PATH} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\n"
+            f"Accept: */*\r\nConnection: close\r\n\r\n".encode()
+        )
+        await _flush(loop, sock, outgoing)
+        sent = time.perf_counter()
+        # TLS 1.3 的会话票据在握手之后才发来，读到应用数据之前可能先处理若干票据
+        while True:
+            try:
+                if tls.read(1):
+                    break
+            except ssl.SSLWantReadError:
+                await _flush(loop, sock, outgoing)
+                await _feed(loop, sock, incoming)
+        first_byte = time.perf_counter()
+
+        return {
+            "connect": (connected - start) * 1000,
+            "handshake": (handshaken - connected) * 1000,
+            "ttfb": (first_byte - sent) * 1000,
+            "resumed": tls.session_reused,
+            "session": tls.session,
+        }
+    finally:
+        sock.close()
+
+
+async def tls_probe_ip(
+    ip: str,
+    port: int,
+    host: str,
+    samples: int,
+    timeout: float,
+    ctx: ssl.SSLContext,
+) -> Dict:
+    """
+    对单个 IP 连续测试 samples 次，第一次成功后复用会话
+
+    Returns:
+        probe.summarize 格式的结果（avg 为 TCP 连接耗时），另带
+        "tls_handshake"（首次完整握手）、"tls_resumed"（复用握手的平均值）、"ttfb"（首字节平均值）、
+        "tls_resumed_count"（成功复用会话的次数）
+    """
+    session = None
+    connects: List[Optional[float]] = []
+    full, resumed, ttfbs = [], [], []
+    for _ in range(samples):
+        try:
+            r = await asyncio.wait_for(tls_sample(ip, port, host, ctx, session), timeout)
+        except (OSError, ssl.SSLError, asyncio.TimeoutError):
+            connects.append(None)
+            continue
+        connects.append(r["connect"])
+        (resumed if r["resumed"] else full).append(r["handshake"])
+        ttfbs.append(r["ttfb"])
+        session = r["session"] or session
+
+    result = summarize(ip, connects)
+    result.update(
+        tls_handshake=full[0] if full else None,
+        tls_resumed=sum(resumed) / len(resumed) if resumed else None,
+        ttfb=sum(ttfbs) / len(ttfbs) if ttfbs else None,
+        tls_resumed_count=len(resumed),
+    )
+    return result
+
+
+async def tls_probe_many(
+    ips: Iterable[str],
+    port: int,
+    host: str = TRACE_HOST,
+    samples: int = 4,
+    concurrency: int = 100,
+    timeout: float = 3.0,
+    verify: bool = True,
+) -> List[Dict]:
+    """
+    并发测试一批 IP，同时进行的 IP 不超过 concurrency 个
+
+    Args:
+        ips: 目标 IP
+        port: TLS 端口
+        host: SNI 和 Host 头使用的域名
+        samples: 每个 IP 的测试次数
+        concurrency: 同时测试的 IP 数
+        timeout: 单次测试（连接到首字节）的超时秒数
+        verify: 是否校验证书
+
+    Returns:
+        tls_probe_ip 的结果列表
+    """
+    ctx = make_context(verify)
+    targets: Iterator[str] = iter(ips)
+    results: List[Dict] = []
+
+    async def worker():
+        for ip in targets:
+            results.append(await tls_probe_ip(ip, port, host, samples, timeout, ctx))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TLS 延迟测试：TCP 连接 / TLS 握手 / 首字节")
+    parser.add_argument("-f", dest="file", default="ip.txt", help="目标文件，每行一个 IP 或 CIDR")
+    parser.add_argument("-t", dest="samples", type=int, default=4, help="每个 IP 的测试次数")
+    parser.add_argument("-n", dest="concurrency", type=int, default=100, help="同时测试的 IP 数")
+    parser.add_argument("-tp", dest="port", type=int, default=443, help="TLS 端口")
+    parser.add_argument("-tl", dest="max_avg", type=float, default=None, help="平均延迟上限（毫秒）")
+    parser.add_argument("-tlr", dest="max_loss", type=float, default=1.0, help="丢包率上限（0-1）")
+    parser.add_argument("-o", dest="output", default="result.csv", help="输出文件")
+    parser.add_argument("--host", default=TRACE_HOST, help="SNI 和 Host 头使用的域名")
+    parser.add_argument("--timeout", type=float, default=3.0, help="单次测试超时秒数")
+    parser.add_argument("--insecure", action="store_true", help="不校验证书")
+    args = parser.parse_args()
+
+    raise_nofile_limit(args.concurrency)
+    ips = load_targets(args.file)
+    print(f"开始 TLS 测试: {len(ips)} 个 IP，端口 {args.port}，SNI {args.host}，每个 IP {args.samples} 次")
+
+    start = time.perf_counter()
+    results = asyncio.run(tls_probe_many(
+        ips, args.port, args.host, args.samples, args.concurrency, args.timeout, not args.insecure,
+    ))
+    ranked = rank_results(results, args.max_loss, args.max_avg)
+    write_result_csv(ranked, args.output)
+
+    print(f"测试完成，用时 {time.perf_counter() - start:.2f}s，可用 {len(ranked)}/{len(results)} 个，已保存到 {args.output}")
+    for r in ranked[:10]:
+        resumed = f"{r['tls_resumed']:.2f}" if r["tls_resumed"] is not None else "-"
+        full = f"{r['tls_handshake']:.2f}" if r["tls_handshake"] is not None else "-"
+        print(f" - {r['ip']}  丢包 {r['loss']:.2f}  连接 {r['avg']:.2f} ms  握手 {full} ms  "
+              f"复用握手 {resumed} ms  首字节 {r['ttfb']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
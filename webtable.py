@@ -0,0 +1,184 @@
+"""
+网页表格的 HTTP 抓取与解析（只依赖 requests 和标准库，不需要 Playwright）
+- TableParser 解析 table.table-striped 的行，输出 (运营商, IP, 最后更新时间)
+- 页面没有表格时从页面脚本引用的 JSON 接口中找记录
+- huoq.py 的 HTTP 快速通道和 harvest.py 的多来源采集共用这里的逻辑，
+  未安装 Playwright 的环境也能导入
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class TableParser(HTMLParser):
+    """
+    用标准库 HTMLParser 解析 table.table-striped 的 tbody 行，
+    输出与 extract_table_rows 相同的 (运营商, IP, 最后更新时间) 结构
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._table_depth = 0
+        self._in_tbody = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self._table_depth or "table-striped" in (dict(attrs).get("class") or "").split():
+                self._table_depth += 1
+        elif not self._table_depth:
+            return
+        elif tag == "tbody":
+            self._in_tbody = True
+        elif tag == "tr" and self._in_tbody:
+            self._row = []
+        elif tag in ("th", "td") and self._row is not None:
+            self._cell = [tag, []]
+            self._row.append(self._cell)
+        elif tag == "br" and self._cell is not None:
+            self._cell[1].append(" ")
+
+    def handle_endtag(self, tag):
+        if not self._table_depth:
+            return
+        if tag == "table":
+            self._table_depth -= 1
+        elif tag == "tbody":
+            self._in_tbody = False
+        elif tag in ("th", "td"):
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self._finish_row()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell[1].append(data)
+
+    def _finish_row(self):
+        cells = [(tag, " ".join("".join(parts).split())) for tag, parts in self._row]
+        self._row = None
+        if len(cells) < 3:
+            return
+        tds = [text for tag, text in cells if tag == "td"]
+        self.rows.append((cells[1][1], cells[2][1], tds[-1] if len(tds) >= 8 else ""))
+
+
+# JSON 接口中常见的字段名，用于把接口数据映射成表格行
+JSON_ISP_KEYS = ("isp", "line", "carrier", "operator", "线路", "运营商")
+JSON_IP_KEYS = ("ip", "address", "addr", "优选地址", "IP")
+JSON_TIME_KEYS = ("update_time", "updated_at", "updated", "time", "last_update", "更新时间")
+# 页面脚本中引用的数据接口，如 fetch("/api/ips") 或 "data.json"
+JSON_ENDPOINT_PATTERN = re.compile(r"""["'`]((?:https?://|/)[^"'`\s]*(?:/api/|\.json)[^"'`\s]*)["'`]""")
+
+_http_session = None
+
+
+def get_http_session():
+    """共享的 requests 会话，复用连接池"""
+    global _http_session
+    if _http_session is None:
+        _http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.5))
+        _http_session.mount("http://", adapter)
+        _http_session.mount("https://", adapter)
+        _http_session.headers["User-Agent"] = (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+        )
+    return _http_session
+
+
+def response_text(resp):
+    """响应正文；Content-Type 未声明编码时按内容推断，避免中文被当成 ISO-8859-1 解码"""
+    if "charset" not in resp.headers.get("Content-Type", "").lower():
+        resp.encoding = resp.apparent_encoding
+    return resp.text
+
+
+def _json_field(item, keys):
+    for key in keys:
+        if key in item and item[key] is not None:
+            return str(item[key]).strip()
+    return ""
+
+
+def rows_from_json(data):
+    """
+    从 JSON 接口数据中找出记录列表并转换成 (运营商, IP, 最后更新时间) 行
+
+    Args:
+        data: 解析后的 JSON 数据
+
+    Returns:
+        行列表，找不到可识别的记录时返回空列表
+    """
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            records = [item for item in node if isinstance(item, dict)]
+            rows = [
+                (_json_field(item, JSON_ISP_KEYS), _json_field(item, JSON_IP_KEYS), _json_field(item, JSON_TIME_KEYS))
+                for item in records
+            ]
+            rows = [row for row in rows if row[1]]
+            if rows:
+                return rows
+            stack.extend(node)
+    return []
+
+
+def fetch_table_rows_http(url, timeout=15, validators=None):
+    """
+    不启动浏览器，直接用 HTTP 抓取页面并解析表格；
+    页面没有表格时尝试页面脚本中引用的 JSON 接口
+
+    Args:
+        url: 页面地址
+        timeout: 单次请求超时秒数
+        validators: 上次记录的 {"etag": ..., "last_modified": ...}，用于条件请求
+
+    Returns:
+        (行列表, 数据来源说明, 本次响应的 validators)；服务器返回 304 时行列表为 None
+    """
+    session = get_http_session()
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    resp = session.get(url, timeout=timeout, headers=headers)
+    if resp.status_code == 304:
+        return None, "304 Not Modified", validators
+    resp.raise_for_status()
+    new_validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+
+    if "json" in resp.headers.get("Content-Type", ""):
+        return rows_from_json(resp.json()), "json", new_validators
+
+    html = response_text(resp)
+    parser = TableParser()
+    parser.feed(html)
+    parser.close()
+    if parser.rows:
+        return parser.rows, "html", new_validators
+
+    for endpoint in dict.fromkeys(JSON_ENDPOINT_PATTERN.findall(html)):
+        try:
+            api_resp = session.get(urljoin(url, endpoint), timeout=timeout)
+            api_resp.raise_for_status()
+            rows = rows_from_json(api_resp.json())
+        except (requests.RequestException, ValueError):
+            continue
+        if rows:
+            return rows, f"json {endpoint}", new_validators
+    return [], "html", new_validators
@@ -1,23 +1,12 @@
-import pandas as pd
-import sys
+from emit import Output, emit, report
+from results import load_results
 
-def csv_to_txt(csv_filename, output_filename, area_name):
-    df = pd.read_csv(csv_filename, encoding='utf-8')
-    ips = df.iloc[:, 0]
-    download_speeds = df.iloc[:, 5]
+DEFAULT_PORT = 2087
 
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        for i, (ip, speed) in enumerate(zip(ips, download_speeds)):
-            #f.write(f"{ip}:8443#{area_name}{i+1}\n")
-            f.write(f"{ip}\n")
-def csv_to_txtt(csv_filename, output_filename, area_name):
-    df = pd.read_csv(csv_filename, encoding='utf-8')
-    ips = df.iloc[:, 0]
-    download_speeds = df.iloc[:, 5]
-
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        for i, (ip, speed) in enumerate(zip(ips, download_speeds)):
-            f.write(f"{ip}:2087#↓{speed}\n")
-            
-csv_to_txt("HKG.csv", "ivv.txt", "xn")
-csv_to_txtt("HKG.csv", "valid_ips.txt", "xn")
+# ivv.txt 为全部 IP，valid_ips.txt 为 ip:端口#↓速度（多端口测试的结果带有“端口”列，否则沿用 2087）
+# 一次遍历同时生成两个文件，内容未变化的文件不重写
+table = load_results("HKG.csv")
+report(emit(table, [
+    Output("ivv.txt", "ip"),
+    Output("valid_ips.txt", "speed"),
+], default_port=DEFAULT_PORT))
@@ -1,25 +1,14 @@
-import pandas as pd
+from emit import Output, emit, report
+from ranking import score_from_env, select_top_file
 
-def csv_to_txt(csv_filename, output_filename, area_name):
-    df = pd.read_csv(csv_filename, encoding='utf-8')
-    
-    # 按TCP延迟列排序并取前9个
-    df_sorted = df.sort_values(by=df.columns[6])  # 第7列是TCP延迟
-    top_9_ips = df_sorted.iloc[:9, 0]  # 前9行的第1列（IP地址）
-    
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        for ip in top_9_ips:
-            f.write(f"{ip}\n")
-    
-    
+DEFAULT_PORT = 2087
+# 综合评分配置，格式见 ranking.py，默认只按延迟排序
+SCORE = score_from_env()
 
-def csv_to_txtt(csv_filename, output_filename, area_name):
-    df = pd.read_csv(csv_filename, encoding='utf-8')
-    df_sorted = df.sort_values(by=df.columns[6])  # 第7列是TCP延迟
-    top_9_ips = df_sorted.iloc[:9, 0]  # 前9行的第1列（IP地址）
-    
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        for i, ip in enumerate(top_9_ips, 1):  # 使用enumerate获取索引，从1开始
-            f.write(f"{ip}:2087#{area_name}{i}\n")           
-csv_to_txt("result.csv", "yd.txt", "xn")
-csv_to_txtt("result.csv", "valid_ipsyd.txt", "xn")
+# 按综合评分（默认为TCP延迟）取前9个，同一IP只保留一行；文件很大时分块读取，内存不随文件增长
+# yd.txt 为IP，valid_ipsyd.txt 为 ip:端口#xnN（多端口测试的结果带有“端口”列，否则沿用 2087）
+table, order = select_top_file("result.csv", 9, SCORE)
+report(emit(table, [
+    Output("yd.txt", "ip"),
+    Output("valid_ipsyd.txt", "rank", name="xn"),
+], order, DEFAULT_PORT))